@@ -4,31 +4,45 @@ load_dotenv()
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta
 
 import jwt
-import bcrypt
-import nltk
 
 from modules.news_api import get_articles, top_headlines
-from modules.content import fetch_full_content
-from modules.sentiment import analyze_sentiments
+from modules.pipeline import fetch_page, process_page, run_sync
+from modules.streaming import requested_stream_format, stream_response, stream_ready
+from modules.queries import PAGE_SIZE, preferences_query, everything_params, headline_params
+from modules.feeds import read_feed
+from modules.article_store import present, requested_view, is_article_id, get_article
 from modules.summarizer import related_articles_content, gemini_summarizer
 
-from models import db, User
-from cache import r
+from modules.domain_health import all_domain_stats
+from modules import instrumentation, compression
+from modules.json_provider import OrjsonProvider
+from modules.user_profiles import get_profile, store_profile
+from modules.passwords import hash_password, check_password, needs_rehash, PasswordHasherBusy
+from modules.rate_limit import client_ip, check_limits, LOGIN_LIMIT_PER_IP, LOGIN_LIMIT_PER_EMAIL, SIGNUP_LIMIT_PER_IP
 
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
+from models import db, User, engine_options
+from cache import r, cache_stats
 
 app = Flask(__name__)
+# Proxies in front of the app that append to X-Forwarded-For (Render's load balancer is one).
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+app.json = OrjsonProvider(app)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL not found in environment variables!")
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DATABASE_URL)
 db.init_app(app)
+instrumentation.init_app(app)
+compression.init_app(app)
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 CORS(app, resources={
@@ -40,11 +54,55 @@ CORS(app, resources={
 })
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Optional bearer token Prometheus must send to /metrics.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
+# Lets endpoints identify callers by the body's email while clients move
+# to the Bearer token from /login or /signup; scheduled to be turned off
+# once they have.
+ALLOW_BODY_EMAIL_IDENTITY = os.getenv("ALLOW_BODY_EMAIL_IDENTITY", "1") == "1"
+# Makes /update_preferences require the Bearer token even while
+# ALLOW_BODY_EMAIL_IDENTITY is on; enable together with the frontend
+# release that sends it.
+REQUIRE_TOKEN_FOR_PREFERENCE_UPDATES = os.getenv("REQUIRE_TOKEN_FOR_PREFERENCE_UPDATES", "0") == "1"
+# How long browsers and CDNs may reuse /article/<id> without revalidating.
+ARTICLE_MAX_AGE = int(os.getenv("ARTICLE_MAX_AGE", "300"))
 
 if not NEWSAPI_KEY:
     raise ValueError("NEWSAPI_KEY not found in environment variables!")
 
+def issue_token(email):
+    return jwt.encode({"email": email, "exp": datetime.utcnow() + timedelta(hours=24)}, SECRET_KEY, algorithm="HS256")
+
+def request_email(data, require_token=False):
+    """
+    Identify the caller: by the Bearer token from /login or /signup, else by the body's email
+
+    The body's email is only accepted when neither require_token nor
+    ALLOW_BODY_EMAIL_IDENTITY rules it out.
+
+    Returns:
+        tuple: (email, error_response); error_response is set when the token is missing where required, or invalid
+    """
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        try:
+            claims = jwt.decode(auth[len("Bearer "):], SECRET_KEY, algorithms=["HS256"])
+        except jwt.ExpiredSignatureError:
+            return None, (jsonify({"error": "Token expired"}), 401)
+        except jwt.InvalidTokenError:
+            return None, (jsonify({"error": "Invalid token"}), 401)
+        return claims.get("email"), None
+    if require_token or not ALLOW_BODY_EMAIL_IDENTITY:
+        return None, (jsonify({"error": "Authorization required"}), 401)
+    return data.get("email"), None
+
+def too_many_attempts(retry_after):
+    response = jsonify({"error": "Too many attempts, try again later"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
 @app.route("/signup", methods=["POST", "OPTIONS"])
 def signup():
     if request.method == "OPTIONS":
@@ -52,12 +110,16 @@ def signup():
     data = request.get_json()
     if not all(k in data for k in ("name", "email", "password", "location")):
         return jsonify({"error": "Missing required fields"}), 400
+
+    retry_after = check_limits("signup", [("ip", client_ip(request), SIGNUP_LIMIT_PER_IP)])
+    if retry_after:
+        return too_many_attempts(retry_after)
     
     existing_user = User.query.filter_by(email=data["email"]).first()
     if existing_user:
         return jsonify({"error": "User already exists"}), 400
     
-    hashed_pw = bcrypt.hashpw(data["password"].encode(), bcrypt.gensalt()).decode()
+    hashed_pw = hash_password(data["password"])
     
     new_user = User(
         name=data["name"],
@@ -74,7 +136,7 @@ def signup():
         db.session.rollback()
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
-    return jsonify({"message": "User registered successfully", "redirect": "/preferences"}), 201
+    return jsonify({"message": "User registered successfully", "redirect": "/preferences", "token": issue_token(new_user.email)}), 201
 
 @app.route("/login", methods=["POST", "OPTIONS"])
 def login():
@@ -85,18 +147,36 @@ def login():
     password = data.get("password")
     if not email or not password:
         return jsonify({"error": "Email and password required"}), 400
+
+    retry_after = check_limits("login", [
+        ("ip", client_ip(request), LOGIN_LIMIT_PER_IP),
+        ("email", email, LOGIN_LIMIT_PER_EMAIL),
+    ])
+    if retry_after:
+        return too_many_attempts(retry_after)
     
     user = User.query.filter_by(email=email).first()
     
-    if not user or not bcrypt.checkpw(password.encode(), user.password.encode()):
+    if not user or not check_password(password, user.password):
         return jsonify({"error": "Invalid credentials"}), 401
+
+    # BCRYPT_ROUNDS changed since this hash was made; upgrade it while we have the password.
+    if needs_rehash(user.password):
+        try:
+            user.password = hash_password(password)
+            db.session.commit()
+        except PasswordHasherBusy:
+            pass  # Upgraded on a later login instead.
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Password rehash failed: {e}")
     
-    token = jwt.encode({"email": email, "exp": datetime.utcnow() + timedelta(hours=24)}, SECRET_KEY, algorithm="HS256")
+    token = issue_token(email)
     
     return jsonify({
         "token": token,
         "redirect": "/news-home",
-        "user": user.as_dict()
+        "user": store_profile(user)
     }), 200
 
 @app.route("/update_preferences", methods=["POST", "OPTIONS"])
@@ -104,7 +184,9 @@ def update_preferences():
     if request.method == "OPTIONS":
         return jsonify({"message": "CORS preflight"}), 200
     data = request.get_json()
-    email = data.get("email")
+    email, error = request_email(data, require_token=REQUIRE_TOKEN_FOR_PREFERENCE_UPDATES)
+    if error:
+        return error
     preferences = data.get("preferred_domains", [])
     if not email:
         return jsonify({"error": "Email required"}), 400
@@ -116,6 +198,7 @@ def update_preferences():
     try:
         user.preferred_domains = preferences
         db.session.commit()
+        store_profile(user)
         return jsonify({"message": "Preferences updated successfully!"}), 200
     except Exception as e:
         db.session.rollback()
@@ -124,15 +207,17 @@ def update_preferences():
 @app.route("/get_preferences", methods=["POST"])
 def get_preferences():
     data = request.get_json()
-    email = data.get("email")
+    email, error = request_email(data)
+    if error:
+        return error
     if not email:
         return jsonify({"error": "Email required"}), 400
         
-    user = User.query.filter_by(email=email).first()
-    if not user:
+    profile = get_profile(email)
+    if not profile:
         return jsonify({"error": "User not found"}), 404
         
-    return jsonify({"preferred_domains": user.preferred_domains or []}), 200
+    return jsonify({"preferred_domains": profile['preferred_domains']}), 200
 
 @app.route("/news", methods=["POST", "OPTIONS"])
 def fetch_news():
@@ -140,9 +225,12 @@ def fetch_news():
         return jsonify({"message": "CORS preflight"}), 200
     
     data = request.get_json()
-    email = data.get("email")
+    email, error = request_email(data)
+    if error:
+        return error
     page = data.get("page", 1)
     category = data.get("category")
+    view = requested_view(data)
 
     if not email:
         return jsonify({"error": "Email required"}), 400
@@ -150,29 +238,39 @@ def fetch_news():
     query = ''
     if category:
         query = category
+        topics = [category]
     else:
-        user = User.query.filter_by(email=email).first()
-        if not user:
+        profile = get_profile(email)
+        if not profile:
             return jsonify({"error": "User not found"}), 404
         
-        topics = user.preferred_domains
+        topics = profile['preferred_domains']
         if not topics or len(topics) == 0:
             return jsonify({"articles": [], "totalResults": 0, "page": page}), 200
-        query = ' OR '.join(topics)
+        query = preferences_query(topics)
+
+    # Served from the worker-built topic feeds when every topic has one.
+    feed = read_feed(topics, page, PAGE_SIZE)
+    if feed is not None:
+        stream_format = requested_stream_format(request, data)
+        if stream_format:
+            return stream_ready(feed['articles'], feed['totalResults'], page, stream_format, view=view)
+        return jsonify({"articles": present(feed['articles'], view), "totalResults": feed['totalResults'], "page": page}), 200
 
-    from_date = (datetime.utcnow() - timedelta(days=3)).strftime('%Y-%m-%d')
-    params = {'q': query, 'from': from_date, 'language': 'en', 'sortBy': 'relevancy', 'page': page, 'pageSize': 20, 'apiKey': NEWSAPI_KEY}
+    params = everything_params(query, page, days=3, api_key=NEWSAPI_KEY)
 
     try:
-        api_response = get_articles(params)
+        api_response = run_sync(fetch_page(get_articles, params))
         if api_response.get('status') != 'ok':
             return jsonify({"error": "Failed to fetch news", "details": api_response.get('message', 'Unknown')}), 500
-        
-        api_response = fetch_full_content(api_response)
-        api_response = analyze_sentiments(api_response)
-        api_response['articles'] = [a for a in api_response.get('articles', []) if a.get('content') and a.get('urlToImage')]
 
-        return jsonify({"articles": api_response.get('articles', []), "totalResults": api_response.get('totalResults', 0), "page": page}), 200
+        stream_format = requested_stream_format(request, data)
+        if stream_format:
+            return stream_response(api_response, page, stream_format, view=view)
+
+        api_response = run_sync(process_page(api_response))
+
+        return jsonify({"articles": present(api_response.get('articles', []), view), "totalResults": api_response.get('totalResults', 0), "page": page}), 200
     
     except Exception as e:
         return jsonify({"error": f"Error fetching news: {str(e)}"}), 500
@@ -184,19 +282,22 @@ def fetch_top_headlines():
     
     data = request.get_json()
     page = data.get("page", 1)
+    view = requested_view(data)
     
-    params = {'country': 'us', 'page': page, 'pageSize': 20, 'apiKey': NEWSAPI_KEY}
+    params = headline_params(page, api_key=NEWSAPI_KEY)
     
     try:
-        api_response = top_headlines(params)
+        api_response = run_sync(fetch_page(top_headlines, params))
         if api_response.get('status') != 'ok':
             return jsonify({"error": "Failed to fetch top headlines", "details": api_response.get('message', 'Unknown')}), 500
+
+        stream_format = requested_stream_format(request, data)
+        if stream_format:
+            return stream_response(api_response, page, stream_format, view=view)
+
+        api_response = run_sync(process_page(api_response))
         
-        api_response = fetch_full_content(api_response)
-        api_response = analyze_sentiments(api_response)
-        api_response['articles'] = [a for a in api_response.get('articles', []) if a.get('content') and a.get('urlToImage')]
-        
-        return jsonify({"articles": api_response.get('articles', []), "totalResults": api_response.get('totalResults', 0), "page": page}), 200
+        return jsonify({"articles": present(api_response.get('articles', []), view), "totalResults": api_response.get('totalResults', 0), "page": page}), 200
     
     except Exception as e:
         return jsonify({"error": f"Error fetching top headlines: {str(e)}"}), 500
@@ -208,21 +309,23 @@ def search():
     data = request.get_json()
     query = data.get('query', '')
     page = data.get('page', 1)
+    view = requested_view(data)
     if not query:
         return jsonify({"error": "Search query is required"}), 400
-    from_date = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
-    params = {'q': query, 'from': from_date, 'language': 'en', 'sortBy': 'relevancy', 'page': page, 'pageSize': 20, 'apiKey': NEWSAPI_KEY}
+    params = everything_params(query, page, days=7, api_key=NEWSAPI_KEY)
 
     try:
-        api_response = get_articles(params)
+        api_response = run_sync(fetch_page(get_articles, params))
         if api_response.get('status') != 'ok':
             return jsonify({"error": "Search failed"}), 500
+
+        stream_format = requested_stream_format(request, data)
+        if stream_format:
+            return stream_response(api_response, page, stream_format, view=view)
+
+        api_response = run_sync(process_page(api_response))
         
-        api_response = fetch_full_content(api_response)
-        api_response = analyze_sentiments(api_response)
-        api_response['articles'] = [a for a in api_response.get('articles', []) if a.get('content') and a.get('urlToImage')]
-        
-        return jsonify({"articles": api_response.get('articles', []), "totalResults": api_response.get('totalResults', 0), "page": page}), 200
+        return jsonify({"articles": present(api_response.get('articles', []), view), "totalResults": api_response.get('totalResults', 0), "page": page}), 200
     except Exception as e:
         return jsonify({"error": f"Search error: {str(e)}"}), 500
 
@@ -243,6 +346,17 @@ def summarize():
     except Exception as e:
         return jsonify({"error": f"Summarization failed: {str(e)}"}), 500
 
+@app.route("/article/<aid>", methods=["GET"])
+def full_article(aid):
+    article = get_article(aid) if is_article_id(aid) else None
+    if article is None:
+        return jsonify({"error": "Article not found"}), 404
+    response = jsonify(article)
+    response.cache_control.public = True
+    response.cache_control.max_age = ARTICLE_MAX_AGE
+    response.add_etag()
+    return response.make_conditional(request)
+
 @app.route("/health", methods=["GET"])
 def health():
     db_status = "disconnected"
@@ -267,6 +381,38 @@ def health():
         "cache": redis_status
     }), 200
 
+@app.route("/admin/domains", methods=["GET"])
+def domain_stats():
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    try:
+        limit = int(request.args.get("limit", 200))
+        return jsonify({"domains": all_domain_stats(limit)}), 200
+    except Exception as e:
+        return jsonify({"error": f"Error reading domain stats: {str(e)}"}), 500
+
+@app.route("/admin/cache", methods=["GET"])
+def local_cache_stats():
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint not found"}), 404
+    return jsonify(cache_stats()), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Endpoint not found"}), 404
+    stats = cache_stats()
+    counters = {f"newslens_cache_{name}_total": stats[name] for name in ('local_hits', 'local_misses', 'redis_hits', 'redis_misses')}
+    gauges = {"newslens_cache_local_bytes": stats['local_bytes'], "newslens_cache_local_entries": stats['local_entries']}
+    body = instrumentation.render_metrics(counters=counters, gauges=gauges)
+    return body, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    response = jsonify({"error": "Server busy, try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
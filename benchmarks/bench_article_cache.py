@@ -0,0 +1,77 @@
+"""
+Bytes stored per article: plain-text entries vs. compressed envelopes.
+
+Extracts the text of every saved page in benchmarks/corpus/ (or --corpus
+DIR), then reports per article the key and value size of the old
+article_cache:{url} entry and of the new envelope, plus encode/decode
+time. With --redis, both forms are also written to the configured Redis
+under throwaway URLs and measured with MEMORY USAGE.
+
+    python -m benchmarks.bench_article_cache --repeat 1000
+    python -m benchmarks.bench_article_cache --redis
+"""
+import argparse
+import time
+
+from benchmarks.bench_extractors import CORPUS_DIR, load_corpus
+from modules.extractors import extract_article_text
+from modules.article_cache import (
+    article_key, legacy_article_key, make_entry, encode_entry, decode_entry, zstandard
+)
+
+# Real article URLs carry slugs and tracking parameters; the key cost grows with them.
+SAMPLE_URL = "https://www.example-news.com/world/2024/05/17/a-fairly-typical-article-slug-for-a-news-story-about-something/?utm_source=newsapi&utm_medium=referral&page={n}"
+
+
+def timed(fn, values, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            fn(value)
+    return (time.perf_counter() - start) / (repeat * len(values)) * 1e6
+
+
+def redis_usage(pairs):
+    from cache import r
+    pipe = r.pipeline(transaction=False)
+    for key, value in pairs:
+        pipe.set(key, value, ex=60)
+    pipe.execute()
+    try:
+        return sum(r.memory_usage(key) or 0 for key, _ in pairs) / len(pairs)
+    finally:
+        r.delete(*[key for key, _ in pairs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--redis", action="store_true", help="also measure MEMORY USAGE in the configured Redis")
+    args = parser.parse_args()
+
+    texts = [text for text in (extract_article_text(html) for html in load_corpus(args.corpus).values()) if text]
+    urls = [SAMPLE_URL.format(n=n) for n in range(len(texts))]
+    legacy = [(legacy_article_key(url), text.encode("utf-8")) for url, text in zip(urls, texts)]
+    entries = [make_entry(text, etag='"5f1a-61c0b3e2"', last_modified="Fri, 17 May 2024 09:12:44 GMT") for text in texts]
+    envelopes = [(article_key(url), encode_entry(entry)) for url, entry in zip(urls, entries)]
+
+    print(f"{len(texts)} articles, codec {'zstd' if zstandard else 'zlib'}")
+    print(f"{'article':>8} {'text':>8} {'old key':>8} {'old val':>8} {'new key':>8} {'new val':>8} {'ratio':>6}")
+    for n, ((old_key, old_value), (new_key, new_value)) in enumerate(zip(legacy, envelopes)):
+        print(f"{n:>8} {len(texts[n]):>8} {len(old_key):>8} {len(old_value):>8} {len(new_key):>8} {len(new_value):>8} "
+              f"{(len(new_key) + len(new_value)) / (len(old_key) + len(old_value)):>6.2f}")
+
+    old_total = sum(len(k) + len(v) for k, v in legacy) / len(legacy)
+    new_total = sum(len(k) + len(v) for k, v in envelopes) / len(envelopes)
+    print(f"\nmean bytes/article (key + value): old {old_total:.0f}, new {new_total:.0f} ({new_total / old_total:.0%})")
+    print(f"encode {timed(encode_entry, entries, args.repeat):.1f} us/article, "
+          f"decode {timed(decode_entry, [v for _, v in envelopes], args.repeat):.1f} us/article")
+
+    if args.redis:
+        old_usage, new_usage = redis_usage(legacy), redis_usage(envelopes)
+        print(f"redis MEMORY USAGE/article: old {old_usage:.0f}, new {new_usage:.0f} ({new_usage / old_usage:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Throughput, peak memory and output parity of the article extractor backends.
+
+Runs every backend in modules.extractors over the saved pages in
+benchmarks/corpus/ (or --corpus DIR) and compares each against bs4, the
+reference implementation.
+
+    python -m benchmarks.bench_extractors --repeat 200
+"""
+import argparse
+import difflib
+import os
+import time
+import tracemalloc
+
+from modules.extractors import EXTRACTORS
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def load_corpus(path):
+    pages = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(path, name), "rb") as f:
+                pages[name] = f.read()
+    return pages
+
+
+def throughput(extract, pages, repeat):
+    total_bytes = sum(len(html) for html in pages.values()) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages.values():
+            extract(html)
+    elapsed = time.perf_counter() - start
+    return repeat * len(pages) / elapsed, total_bytes / elapsed / 1e6
+
+
+def peak_memory(extract, pages):
+    peak = 0
+    for html in pages.values():
+        tracemalloc.start()
+        extract(html)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    reference = {name: EXTRACTORS["bs4"](html) for name, html in pages.items()}
+
+    print(f"{len(pages)} pages, {sum(map(len, pages.values())) / 1024:.1f} KiB\n")
+    print(f"{'backend':<8}{'pages/s':>10}{'MB/s':>8}{'peak KiB':>10}{'exact':>8}{'similarity':>12}")
+    for backend, extract in EXTRACTORS.items():
+        pages_per_sec, mb_per_sec = throughput(extract, pages, args.repeat)
+        peak = peak_memory(extract, pages)
+        outputs = {name: extract(html) for name, html in pages.items()}
+        exact = sum(outputs[name] == reference[name] for name in pages)
+        similarity = min(difflib.SequenceMatcher(None, outputs[name], reference[name]).ratio() for name in pages)
+        print(f"{backend:<8}{pages_per_sec:>10.0f}{mb_per_sec:>8.2f}{peak:>10.0f}{exact:>5}/{len(pages):<2}{similarity:>12.3f}")
+
+        for name in pages:
+            if outputs[name] != reference[name]:
+                print(f"  differs from bs4: {name}")
+
+
+if __name__ == "__main__":
+    main()
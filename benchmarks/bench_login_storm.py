@@ -0,0 +1,126 @@
+"""
+News endpoint latency with and without a concurrent login storm.
+
+Against a running server (e.g. `gunicorn app:app -k gthread --threads 8`),
+measures latency of a news endpoint on its own, then again while
+--storm threads hammer /login. Test users are created through /signup
+first. Logins rejected with 429 (rate limit) or 503 (hashing pool full)
+are counted separately. Every request comes from one IP and each of the
+--users accounts is hit many times a minute, so start the server with
+the rate limits out of the way, or the run measures the rate limiter
+instead of the hashing pool:
+
+    LOGIN_LIMIT_PER_IP=1000000 LOGIN_LIMIT_PER_EMAIL=1000000 SIGNUP_LIMIT_PER_IP=1000000 \
+        gunicorn app:app -k gthread --threads 8
+    python -m benchmarks.bench_login_storm --base-url http://127.0.0.1:8000 --storm 32
+
+The script warns when signups or storm logins come back 429.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post(base_url, path, body, timeout=30):
+    request = urllib.request.Request(
+        base_url + path, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def measure_news(args, duration):
+    latencies, statuses = [], Counter()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < stop_at:
+            status, elapsed = post(args.base_url, args.news_path, json.loads(args.news_body))
+            statuses[status] += 1
+            latencies.append(elapsed)
+
+    with ThreadPoolExecutor(args.news_clients) as pool:
+        for _ in range(args.news_clients):
+            pool.submit(client)
+    return latencies, statuses
+
+
+def storm(args, users, stop):
+    statuses = Counter()
+
+    def attacker(n):
+        while not stop.is_set():
+            email = users[n % len(users)]
+            status, _ = post(args.base_url, "/login", {"email": email, "password": "storm-password"})
+            statuses[status] += 1
+            n += args.storm
+
+    threads = [threading.Thread(target=attacker, args=(n,), daemon=True) for n in range(args.storm)]
+    for thread in threads:
+        thread.start()
+    return threads, statuses
+
+
+def report(label, latencies, statuses):
+    print(f"{label:>14}: n={len(latencies):>5}  p50={percentile(latencies, 50) * 1000:7.1f}ms  "
+          f"p95={percentile(latencies, 95) * 1000:7.1f}ms  p99={percentile(latencies, 99) * 1000:7.1f}ms  "
+          f"mean={statistics.mean(latencies) * 1000:7.1f}ms  status={dict(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--news-path", default="/top-headlines")
+    parser.add_argument("--news-body", default='{"page": 1}')
+    parser.add_argument("--news-clients", type=int, default=4)
+    parser.add_argument("--storm", type=int, default=32, help="concurrent login threads")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    users = [f"storm-{n}@loadtest.invalid" for n in range(args.users)]
+    signup_statuses = Counter(
+        post(args.base_url, "/signup", {"name": "storm", "email": email, "password": "storm-password", "location": "-"})[0]
+        for email in users
+    )
+    if signup_statuses[429]:
+        print(f"warning: {signup_statuses[429]} of {len(users)} signups were rate limited; raise SIGNUP_LIMIT_PER_IP")
+
+    baseline, baseline_statuses = measure_news(args, args.duration)
+
+    stop = threading.Event()
+    threads, login_statuses = storm(args, users, stop)
+    loaded, loaded_statuses = measure_news(args, args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    report("news baseline", baseline, baseline_statuses)
+    report("news + storm", loaded, loaded_statuses)
+    print(f"{'logins':>14}: {sum(login_statuses.values())} attempts, status={dict(login_statuses)}")
+    if login_statuses[429] > (login_statuses[200] + login_statuses[503]):
+        print("warning: most logins were rate limited (429), so this measured the rate limiter, not the hashing pool; "
+              "raise LOGIN_LIMIT_PER_IP and LOGIN_LIMIT_PER_EMAIL on the server")
+    print(f"p95 change under storm: {percentile(loaded, 95) / percentile(baseline, 95):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Prompt size and end-to-end latency: naive join vs. deduplicated, budgeted assembly.
+
+Builds a set of "related coverage" documents from the corpus where
+several outlets carry the same wire copy with small edits, then times
+prompt assembly plus a stub model whose latency grows with prompt size.
+
+    python -m benchmarks.bench_prompt --copies 4 --budget 1500
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_extractors import CORPUS_DIR, load_corpus
+from modules.extractors import extract_with_bs4
+from modules.prompt import assemble_articles_text, estimate_tokens
+
+
+def syndicated_copy(doc, rng):
+    """Wire copy as re-published by another outlet: same paragraphs, light edits."""
+    paragraphs = doc.split("\n\n")
+    edited = []
+    for paragraph in paragraphs:
+        if rng.random() < 0.15:
+            continue
+        words = paragraph.split()
+        if words and rng.random() < 0.3:
+            words[rng.randrange(len(words))] = rng.choice(["reportedly", "officials", "Tuesday", "local"])
+        edited.append(" ".join(words))
+    edited.insert(0, f"Outlet {rng.randint(1, 99)} staff contributed to this report.")
+    return "\n\n".join(edited)
+
+
+def stub_model(prompt, base, per_1k_tokens):
+    time.sleep(base + per_1k_tokens * estimate_tokens(prompt) / 1000)
+    return "summary"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=4, help="syndicated copies per original story")
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default PROMPT_TOKEN_BUDGET)")
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--latency-per-1k", type=float, default=0.4, help="stub model seconds per 1k prompt tokens")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    originals = ["\n\n".join(extract_with_bs4(html).splitlines()) for html in load_corpus(CORPUS_DIR).values()]
+    docs = []
+    for doc in originals:
+        docs.append(doc)
+        docs.extend(syndicated_copy(doc, rng) for _ in range(args.copies))
+
+    results = {}
+    for name, assemble in (("naive join", lambda d: "\n\n".join(d)), ("dedup + budget", lambda d: assemble_articles_text(d, args.budget))):
+        start = time.perf_counter()
+        text = assemble(docs)
+        assembled = time.perf_counter() - start
+        stub_model(text, args.base_latency, args.latency_per_1k)
+        results[name] = (len(text), estimate_tokens(text), assembled, time.perf_counter() - start)
+
+    naive_tokens = results["naive join"][1]
+    print(f"{len(docs)} documents\n")
+    print(f"{'':<16}{'chars':>8}{'tokens':>8}{'assemble ms':>13}{'end-to-end s':>14}{'reduction':>11}")
+    for name, (chars, tokens, assembled, total) in results.items():
+        print(f"{name:<16}{chars:>8}{tokens:>8}{assembled * 1000:>13.1f}{total:>14.2f}{1 - tokens / naive_tokens:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
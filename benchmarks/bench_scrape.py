@@ -0,0 +1,62 @@
+"""
+Sequential vs. concurrent scrape_articles against a stub site with injected latency.
+
+Needs the same environment as the app (REDIS_URL); scraping runs with
+use_cache=False so every article is actually fetched.
+
+    python -m benchmarks.bench_scrape --articles 20 --latency 0.5 --hosts 4
+"""
+import argparse
+import time
+
+from benchmarks.stub_server import start_stub_server
+from modules.content import scrape_articles
+
+
+def make_response(port, articles, hosts):
+    # Spread articles over several loopback addresses so the per-host limit
+    # behaves the way it does against real publishers.
+    return {
+        "articles": [
+            {
+                "url": f"http://127.0.0.{i % hosts + 1}:{port}/article/{i}",
+                "title": f"Stub article {i} - Stub News",
+                "source": {"name": "Stub News"},
+                "publishedAt": "2024-01-01T12:00:00Z",
+            }
+            for i in range(articles)
+        ]
+    }
+
+
+def run(port, args, concurrent):
+    api_response = make_response(port, args.articles, args.hosts)
+    start = time.perf_counter()
+    texts = scrape_articles([a["url"] for a in api_response["articles"]], deadline=args.deadline, use_cache=False, concurrent=concurrent)
+    elapsed = time.perf_counter() - start
+    scraped = sum(1 for text in texts if text)
+    return elapsed, scraped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds of injected latency per page")
+    parser.add_argument("--hosts", type=int, default=4, help="number of distinct loopback hosts")
+    parser.add_argument("--deadline", type=float, default=None, help="page deadline for the concurrent run")
+    args = parser.parse_args()
+
+    server, port = start_stub_server(latency=args.latency)
+    try:
+        seq_time, seq_ok = run(port, args, concurrent=False)
+        con_time, con_ok = run(port, args, concurrent=True)
+    finally:
+        server.shutdown()
+
+    print(f"sequential: {seq_time:.2f}s ({seq_ok}/{args.articles} scraped)")
+    print(f"concurrent: {con_time:.2f}s ({con_ok}/{args.articles} scraped)")
+    print(f"speedup:    {seq_time / con_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Throughput of batch sentiment scoring vs. one TextBlob per article.
+
+Documents are the extracted texts of benchmarks/corpus/ repeated up to
+--docs. Also checks that both paths agree within --tolerance.
+
+    python -m benchmarks.bench_sentiment --docs 2000 --processes 4
+"""
+import argparse
+import os
+import time
+
+from benchmarks.bench_extractors import CORPUS_DIR, load_corpus
+from modules.extractors import extract_with_bs4
+from modules.sentiment import score_documents, score_sentiment_textblob
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    texts = [extract_with_bs4(html) for html in load_corpus(CORPUS_DIR).values()]
+    docs = [texts[i % len(texts)] + f" (copy {i})" for i in range(args.docs)]
+
+    runs = {}
+    start = time.perf_counter()
+    reference = [score_sentiment_textblob(doc) for doc in docs]
+    runs["textblob per article"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = score_documents(docs, processes=0)
+    runs["batch"] = time.perf_counter() - start
+
+    # First call pays for starting the pool; time a second one.
+    score_documents(docs, processes=args.processes)
+    start = time.perf_counter()
+    pooled = score_documents(docs, processes=args.processes)
+    runs[f"batch, {args.processes} processes"] = time.perf_counter() - start
+
+    for name, elapsed in runs.items():
+        print(f"{name:<24}{args.docs / elapsed:>10.0f} docs/s")
+
+    worst = max(
+        max(abs(a["raw_polarity"] - b["raw_polarity"]), abs(a["raw_subjectivity"] - b["raw_subjectivity"]))
+        for ref, got in ((reference, batch), (reference, pooled))
+        for a, b in zip(ref, got)
+    )
+    print(f"max abs difference vs TextBlob: {worst:.2e} ({'ok' if worst <= args.tolerance else 'FAIL'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Cold-start time: how long until a fresh server answers GET /health.
+
+Starts the app (gunicorn by default) in a subprocess several times and
+reports the time from spawn to the first 200 from /health, plus the time
+to just `import app`. Needs the same environment as the app (.env with
+REDIS_URL, DATABASE_URL, NEWSAPI_KEY, ...). With --max-seconds it exits
+non-zero when the median exceeds the budget, so it can gate a deploy.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --max-seconds 3
+"""
+import argparse
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_COMMAND = "gunicorn app:app --bind 127.0.0.1:{port} --workers 1"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_health(command, timeout):
+    port = free_port()
+    started = time.perf_counter()
+    # No shell, so terminate() reaches the server rather than sh.
+    proc = subprocess.Popen(shlex.split(command.format(port=port)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with status {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f"no healthy response within {timeout}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def time_to_import():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], check=True, env=os.environ.copy())
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--command", default=DEFAULT_COMMAND, help="server command; {port} is filled in")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--max-seconds", type=float, help="fail if the median time to /health exceeds this")
+    args = parser.parse_args()
+
+    imports = [time_to_import() for _ in range(args.runs)]
+    health = [time_to_health(args.command, args.timeout) for _ in range(args.runs)]
+
+    print(f"import app:        median {statistics.median(imports):.2f}s  max {max(imports):.2f}s")
+    print(f"first /health 200: median {statistics.median(health):.2f}s  max {max(health):.2f}s")
+
+    if args.max_seconds is not None and statistics.median(health) > args.max_seconds:
+        print(f"FAIL: median time to /health is over the {args.max_seconds:.2f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare two saved load test runs and flag regressions.
+
+Prints p50/p95/p99, RPS and error rate per endpoint for a baseline and a
+candidate run written by benchmarks.loadtest --output. Exits non-zero
+when any endpoint's p95 or p99 grew, or its RPS fell, by more than
+--threshold percent, or its error rate rose by more than
+--error-threshold, so it can gate a merge or deploy.
+
+    python -m benchmarks.compare_loadtest results/before.json results/after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# (field, True if higher is worse)
+METRICS = [("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("rps", False)]
+GATED = {"p95_ms", "p99_ms", "rps"}
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(baseline, candidate, threshold, error_threshold):
+    """Print the comparison table; returns the list of regressions found."""
+    regressions = []
+    rows = dict(baseline["endpoints"], overall=baseline["overall"])
+    candidate_rows = dict(candidate["endpoints"], overall=candidate["overall"])
+    print(f"{'endpoint':>14} {'metric':>8} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for name, before in rows.items():
+        after = candidate_rows.get(name)
+        if not before or not after:
+            print(f"{name:>14}  missing from {'candidate' if before else 'baseline'}")
+            continue
+        for field, higher_is_worse in METRICS:
+            delta = change(before[field], after[field])
+            worse = delta > threshold if higher_is_worse else delta < -threshold
+            flag = "  REGRESSION" if worse and field in GATED else ""
+            print(f"{name:>14} {field:>8} {before[field]:>10.1f} {after[field]:>10.1f} {delta:>+7.1f}%{flag}")
+            if flag:
+                regressions.append(f"{name} {field} {delta:+.1f}%")
+        error_delta = after["error_rate"] - before["error_rate"]
+        flag = "  REGRESSION" if error_delta > error_threshold else ""
+        print(f"{name:>14} {'errors':>8} {before['error_rate']:>10.2%} {after['error_rate']:>10.2%} {error_delta * 100:>+7.1f}pp{flag}")
+        if flag:
+            regressions.append(f"{name} error rate {error_delta * 100:+.1f}pp")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed percent change in p95/p99/RPS")
+    parser.add_argument("--error-threshold", type=float, default=0.01, help="allowed rise in error rate (fraction)")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"baseline:  {baseline.get('label') or args.baseline} ({baseline.get('commit')}, {baseline.get('started_at')})")
+    print(f"candidate: {candidate.get('label') or args.candidate} ({candidate.get('commit')}, {candidate.get('started_at')})")
+    if baseline.get("config", {}).get("mix") != candidate.get("config", {}).get("mix"):
+        print("warning: runs used different --mix settings")
+
+    regressions = compare(baseline, candidate, args.threshold, args.error_threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): " + "; ".join(regressions))
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Load test for the news endpoints against local stand-ins.
+
+Starts a stub NewsAPI and stub article sites (with configurable latency,
+jitter, error rate and optional HTML fixtures), an in-process fake Redis
+server unless --redis-url is given, and the app under gunicorn with a
+throwaway SQLite database and SUMMARIZER_BACKEND=stub, so nothing leaves
+the machine. It then signs up test users with random topic preferences
+and drives /news, /search, /top-headlines and /summarize in the --mix
+proportions from --concurrency clients, and reports p50/p95/p99 latency
+and RPS per endpoint. With --output the run is saved as JSON for
+benchmarks.compare_loadtest.
+
+    python -m benchmarks.loadtest --concurrency 16 --duration 30 --output results/before.json
+    python -m benchmarks.loadtest --site-latency 0.3 --site-error-rate 0.05 --output results/after.json
+    python -m benchmarks.compare_loadtest results/before.json results/after.json
+
+With --base-url it drives an already running server instead; that server
+must itself be pointed at the stand-ins (NEWSAPI_BASE_URL, ...).
+
+The fake Redis needs the packages in benchmarks/requirements.txt:
+
+    pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from benchmarks.stub_server import load_fixtures, start_stub_newsapi, start_stub_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_COMMAND = "gunicorn app:app --bind 127.0.0.1:{port} --workers 2 --worker-class gthread --threads 8"
+DEFAULT_MIX = "news=4,top-headlines=3,search=2,summarize=1"
+TOPICS = ["technology", "business", "sports", "science", "health", "politics", "climate", "travel"]
+SEARCH_TERMS = ["election", "markets", "vaccine", "rocket launch", "drought", "merger", "transfer window", "heatwave"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post(base_url, path, body, timeout=60, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(base_url + path, data=json.dumps(body).encode(), headers=headers, method="POST")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def start_fake_redis():
+    from fakeredis import TcpFakeServer
+
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{port}/0"
+
+
+def app_environment(args, newsapi_port, redis_url, database_url):
+    env = os.environ.copy()
+    env.update({
+        "REDIS_URL": redis_url,
+        "DATABASE_URL": database_url,
+        "NEWSAPI_KEY": "loadtest",
+        "NEWSAPI_BASE_URL": f"http://127.0.0.1:{newsapi_port}/v2",
+        "SUMMARIZER_BACKEND": "stub",
+        "SUMMARIZER_STUB_LATENCY": str(args.summarizer_latency),
+        "REQUEST_LOG_ENABLED": "0",
+        # Signing up test users should not dominate setup time, or trip the login limits.
+        "BCRYPT_ROUNDS": "4",
+        "LOGIN_LIMIT_PER_IP": "1000000",
+        "LOGIN_LIMIT_PER_EMAIL": "1000000",
+        "SIGNUP_LIMIT_PER_IP": "1000000",
+    })
+    return env
+
+
+def start_app(args, env):
+    subprocess.run([sys.executable, "-c", "from app import app, db\nwith app.app_context(): db.create_all()"],
+                   check=True, cwd=ROOT, env=env)
+    port = free_port()
+    # No shell, so terminate() reaches the gunicorn master rather than sh.
+    proc = subprocess.Popen(shlex.split(args.app_command.format(port=port)), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited with status {proc.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=1):
+                return proc, base_url
+        except urllib.error.HTTPError:
+            # Any HTTP response, even an error, means the server is up.
+            return proc, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("app did not start within 60s")
+
+
+def stop_app(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _post_for_token(base_url, path, body):
+    request = urllib.request.Request(
+        base_url + path, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read()).get("token")
+
+
+def signup(base_url, email):
+    """Sign a load-test user up, or log in if a reused --database-url has it; returns its token."""
+    credentials = {"email": email, "password": "load-password"}
+    try:
+        return _post_for_token(base_url, "/signup", dict(credentials, name="load", location="-"))
+    except urllib.error.HTTPError:
+        return _post_for_token(base_url, "/login", credentials)
+
+
+def create_users(base_url, count):
+    rng = random.Random(0)
+    users = []
+    for n in range(count):
+        email = f"load-{n}@loadtest.invalid"
+        token = signup(base_url, email)
+        post(base_url, "/update_preferences", {"preferred_domains": rng.sample(TOPICS, rng.randint(1, 3))}, token=token)
+        users.append(email)
+    return users
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"news", "top-headlines", "search", "summarize"}
+    if unknown:
+        raise SystemExit(f"unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def make_request(endpoint, rng, users, args, site_port):
+    page = rng.randint(1, args.pages)
+    if endpoint == "news":
+        return "/news", {"email": rng.choice(users), "page": page}
+    if endpoint == "top-headlines":
+        return "/top-headlines", {"page": page}
+    if endpoint == "search":
+        return "/search", {"query": rng.choice(SEARCH_TERMS), "page": page}
+    # An article the stub NewsAPI also lists, so related-article lookups find real neighbours.
+    topic = rng.choice(TOPICS)
+    return "/summarize", {"article_url": f"http://127.0.0.1:{site_port}/article/{topic}-{rng.randint(0, 19)}"}
+
+
+def drive(base_url, users, args, site_port, duration, seed):
+    weights = parse_mix(args.mix)
+    endpoints, endpoint_weights = list(weights), list(weights.values())
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(n):
+        rng = random.Random(seed * 1000 + n)
+        while time.perf_counter() < stop_at:
+            endpoint = rng.choices(endpoints, endpoint_weights)[0]
+            path, body = make_request(endpoint, rng, users, args, site_port)
+            status, elapsed = post(base_url, path, body, timeout=args.timeout)
+            with lock:
+                latencies[endpoint].append(elapsed)
+                statuses[endpoint][status] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def summarize(latencies, statuses, elapsed):
+    """Per-endpoint and overall latency percentiles (ms), RPS and status counts."""
+    def stats(values, counts):
+        errors = sum(count for status, count in counts.items() if status == 0 or status >= 500)
+        return {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 2),
+            "error_rate": round(errors / len(values), 4),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+            "mean_ms": round(statistics.mean(values) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+            "statuses": {str(status): count for status, count in sorted(counts.items())},
+        }
+
+    endpoints = {name: stats(values, statuses[name]) for name, values in sorted(latencies.items()) if values}
+    all_values = [value for values in latencies.values() for value in values]
+    all_statuses = sum(statuses.values(), Counter())
+    return {"endpoints": endpoints, "overall": stats(all_values, all_statuses) if all_values else {}}
+
+
+def report(results):
+    rows = dict(results["endpoints"], overall=results["overall"])
+    print(f"{'endpoint':>14} {'n':>6} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for name, row in rows.items():
+        if not row:
+            continue
+        print(f"{name:>14} {row['requests']:>6} {row['rps']:>8.1f} {row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms "
+              f"{row['p99_ms']:>7.1f}ms {row['error_rate']:>7.1%}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", help="drive this running server instead of starting one")
+    parser.add_argument("--app-command", default=DEFAULT_COMMAND)
+    parser.add_argument("--redis-url", help="use this Redis instead of an in-process fake")
+    parser.add_argument("--database-url", help="default: a throwaway SQLite file")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of load before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. news=4,search=1")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=3, help="pages requested are drawn from 1..PAGES")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--newsapi-latency", type=float, default=0.1)
+    parser.add_argument("--newsapi-error-rate", type=float, default=0.0)
+    parser.add_argument("--site-latency", type=float, default=0.2)
+    parser.add_argument("--site-jitter", type=float, default=0.2)
+    parser.add_argument("--site-error-rate", type=float, default=0.02)
+    parser.add_argument("--site-hosts", type=int, default=4, help="loopback addresses articles are spread over")
+    parser.add_argument("--fixtures", help="directory of article HTML to serve, e.g. benchmarks/corpus")
+    parser.add_argument("--summarizer-latency", type=float, default=1.0, help="seconds the stub model takes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--verbose", action="store_true", help="show the app's stderr")
+    args = parser.parse_args()
+
+    site, site_port = start_stub_server(latency=args.site_latency, jitter=args.site_jitter, error_rate=args.site_error_rate,
+                                        varied=True, fixtures=load_fixtures(args.fixtures))
+    newsapi, newsapi_port = start_stub_newsapi(site_port, site_hosts=args.site_hosts, latency=args.newsapi_latency,
+                                               error_rate=args.newsapi_error_rate)
+    proc = redis_server = None
+    tmpdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+    try:
+        base_url = args.base_url
+        if not base_url:
+            redis_url = args.redis_url
+            if not redis_url:
+                redis_server, redis_url = start_fake_redis()
+            database_url = args.database_url or f"sqlite:///{os.path.join(tmpdir.name, 'loadtest.db')}"
+            proc, base_url = start_app(args, app_environment(args, newsapi_port, redis_url, database_url))
+
+        users = create_users(base_url, args.users)
+        if args.warmup:
+            drive(base_url, users, args, site_port, args.warmup, seed=args.seed + 1)
+        latencies, statuses, elapsed = drive(base_url, users, args, site_port, args.duration, seed=args.seed)
+    finally:
+        if proc:
+            stop_app(proc)
+        for server in (site, newsapi, redis_server):
+            if server:
+                server.shutdown()
+        tmpdir.cleanup()
+
+    results = summarize(latencies, statuses, elapsed)
+    report(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "label": args.label,
+                "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "config": {key: value for key, value in vars(args).items() if key not in ("output", "verbose")},
+                "elapsed_s": round(elapsed, 2),
+                **results,
+            }, f, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
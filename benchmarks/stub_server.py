@@ -0,0 +1,160 @@
+"""Local stand-ins for news sites and NewsAPI, used by the benchmarks in this directory."""
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ARTICLE_HTML = """<html><head><title>Stub article {n}</title>
+<script>var tracking = true;</script></head>
+<body><nav>Home | World | Sport</nav>
+<article>
+<h1>Stub article {n}</h1>
+{paragraphs}
+</article>
+<footer>Copyright Stub News</footer></body></html>"""
+
+PARAGRAPH = "<p>Paragraph {i} of article {n}. Officials said the measure would take effect next week, drawing mixed reactions.</p>"
+
+# Varied enough that near-duplicate detection keeps distinct stub articles apart.
+WORDS = (
+    "council budget election storm market rally court ruling vaccine trial rocket launch harbor strike "
+    "drought harvest merger startup protest treaty museum festival bridge tunnel satellite glacier "
+    "senator mayor coach striker orchestra surgeon farmer pilot engineer refinery railway stadium "
+    "approved rejected delayed expanded announced warned praised questioned welcomed criticised"
+).split()
+
+
+def render_article(n, paragraphs=12, varied=False):
+    if not varied:
+        body = "\n".join(PARAGRAPH.format(i=i, n=n) for i in range(paragraphs))
+        return ARTICLE_HTML.format(n=n, paragraphs=body)
+    rng = random.Random(str(n))
+    body = "\n".join(
+        "<p>" + " ".join(rng.choice(WORDS) for _ in range(30)).capitalize() + ".</p>"
+        for _ in range(paragraphs)
+    )
+    return ARTICLE_HTML.format(n=n, paragraphs=body)
+
+
+def load_fixtures(directory):
+    """HTML pages from a fixture directory (e.g. benchmarks/corpus), served in turn instead of generated ones."""
+    if not directory:
+        return []
+    return [
+        open(os.path.join(directory, name), encoding="utf-8").read()
+        for name in sorted(os.listdir(directory)) if name.endswith(".html")
+    ]
+
+
+def _injected_failure(handler):
+    """Sleep for the configured latency, then fail the request with the configured probability."""
+    time.sleep(handler.latency + random.random() * handler.jitter)
+    if random.random() < handler.error_rate:
+        handler.send_error(503, "Injected failure")
+        return True
+    return False
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    varied = False
+    fixtures = ()
+
+    def do_GET(self):
+        if _injected_failure(self):
+            return
+        n = self.path.rstrip("/").rsplit("/", 1)[-1]
+        if self.fixtures:
+            body = self.fixtures[sum(map(ord, n)) % len(self.fixtures)]
+        else:
+            body = render_article(n, varied=self.varied)
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubNewsAPIHandler(BaseHTTPRequestHandler):
+    """Answers /v2/everything and /v2/top-headlines with articles hosted on the stub site."""
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    site_url = "http://127.0.0.1"
+    site_hosts = 1
+    total_results = 100
+
+    def do_GET(self):
+        if _injected_failure(self):
+            return
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        endpoint = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+        if endpoint not in ("everything", "top-headlines"):
+            self.send_error(404)
+            return
+        page = int(params.get("page", 1))
+        page_size = int(params.get("pageSize", 20))
+        query = params.get("q") or params.get("country") or "headlines"
+        body = json.dumps(self.page(query, page, page_size)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def page(self, query, page, page_size):
+        # The same query and page always name the same articles, so caches behave as they would upstream.
+        slug = "-".join(query.lower().split())[:40]
+        first = (page - 1) * page_size
+        articles = []
+        for i in range(first, min(first + page_size, self.total_results)):
+            host = f"127.0.0.{i % self.site_hosts + 1}"
+            articles.append({
+                "source": {"id": None, "name": "Stub News"},
+                "author": "Stub Reporter",
+                "title": f"{slug} story {i} - Stub News",
+                "description": f"Stub description for {slug} story {i}.",
+                "url": f"{self.site_url.format(host=host)}/article/{slug}-{i}",
+                "urlToImage": f"{self.site_url.format(host=host)}/image/{slug}-{i}.jpg",
+                "publishedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - i * 600)),
+                "content": f"Stub snippet for {slug} story {i}… [+1200 chars]",
+            })
+        return {"status": "ok", "totalResults": self.total_results, "articles": articles}
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(handler, host, port):
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, server.server_address[1]
+
+
+def start_stub_server(latency=0.0, host="0.0.0.0", port=0, jitter=0.0, error_rate=0.0, varied=False, fixtures=()):
+    """Start a threaded stub site in the background; returns (server, port)."""
+    handler = type("LatencyHandler", (StubSiteHandler,), {
+        "latency": latency, "jitter": jitter, "error_rate": error_rate, "varied": varied, "fixtures": tuple(fixtures),
+    })
+    return _serve(handler, host, port)
+
+
+def start_stub_newsapi(site_port, site_hosts=1, latency=0.0, jitter=0.0, error_rate=0.0, total_results=100, host="127.0.0.1", port=0):
+    """Start a threaded NewsAPI stand-in whose articles live on the stub site at site_port; returns (server, port)."""
+    handler = type("NewsAPIHandler", (StubNewsAPIHandler,), {
+        "latency": latency, "jitter": jitter, "error_rate": error_rate, "total_results": total_results,
+        "site_url": "http://{host}:" + str(site_port), "site_hosts": site_hosts,
+    })
+    return _serve(handler, host, port)
@@ -1,8 +1,18 @@
 # cache.py
 import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
 import redis
 from dotenv import load_dotenv
 
+from modules.instrumentation import TimedRedis
+
 load_dotenv() # Load .env variables
 
 # 1. Get the single URL from the .env file
@@ -11,11 +21,260 @@ REDIS_URL = os.getenv("REDIS_URL")
 if not REDIS_URL:
     raise ValueError("REDIS_URL must be set in your .env file")
 
-# 2. Connect using the from_url() method
-try:
-    r = redis.Redis.from_url(REDIS_URL)
-    r.ping() # Test the connection
-    print("Connected to Redis at Upstash.")
-except Exception as e:
-    print(f"Failed to connect to Redis: {e}")
-    raise
\ No newline at end of file
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "3"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+
+# 2. Create the client; it only connects on the first command, so importing
+# this module never waits on (or fails because of) Redis. /health reports
+# whether it is reachable.
+r = TimedRedis(redis.Redis.from_url(
+    REDIS_URL,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    health_check_interval=30,
+))
+
+logger = logging.getLogger(__name__)
+
+def url_digest(url):
+    """Fixed-length stand-in for a URL in cache keys; long query strings would otherwise bloat every key."""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Upper bound on how long a value is served from process memory without asking Redis.
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "60"))
+LOCAL_CACHE_INVALIDATION = os.getenv("LOCAL_CACHE_INVALIDATION", "1") == "1"
+# Misses are remembered only while invalidations are on, so another worker's write clears them.
+LOCAL_CACHE_NEGATIVE_TTL = float(os.getenv("LOCAL_CACHE_NEGATIVE_TTL", "10"))
+INVALIDATION_CHANNEL = "cache:invalidate"
+# Rough per-entry overhead of the key, tuple and OrderedDict node.
+_ENTRY_OVERHEAD = 100
+# Stored for keys Redis does not have.
+MISSING = object()
+
+class LocalCache:
+    """
+    Thread-safe LRU of Redis values, bounded by total bytes, with per-entry expiry
+
+    Sits in front of Redis in get_many/set_many so repeated lookups of hot
+    keys in one worker never leave the process.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The cached value, MISSING for a remembered miss, or None if not held."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        size = len(key) + (0 if value is MISSING else len(value)) + _ENTRY_OVERHEAD
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+local_cache = LocalCache(LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_TTL)
+_stats = {'local_hits': 0, 'local_misses': 0, 'redis_hits': 0, 'redis_misses': 0}
+_stats_lock = threading.Lock()
+# Tags our own invalidation messages so a process does not evict what it just wrote.
+_instance_id = uuid.uuid4().hex
+_listener_started = False
+_listener_ready = threading.Event()
+_listener_lock = threading.Lock()
+
+def _count(local_hits=0, local_misses=0, redis_hits=0, redis_misses=0):
+    with _stats_lock:
+        _stats['local_hits'] += local_hits
+        _stats['local_misses'] += local_misses
+        _stats['redis_hits'] += redis_hits
+        _stats['redis_misses'] += redis_misses
+
+def cache_stats():
+    """Hit/miss counters per tier since the process started, plus the local tier's size."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['local_entries'] = len(local_cache)
+    stats['local_bytes'] = local_cache.bytes
+    stats['local_max_bytes'] = local_cache.max_bytes
+    return stats
+
+def _as_bytes(key, value):
+    # Store what Redis would hand back so both tiers return the same type.
+    key = key.decode('utf-8') if isinstance(key, bytes) else key
+    return key, value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+def _seconds(ttl):
+    return ttl.total_seconds() if isinstance(ttl, timedelta) else float(ttl)
+
+def _listen_for_invalidations():
+    while True:
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything written while we were disconnected was never announced to us.
+            local_cache.clear()
+            _listener_ready.set()
+            while True:
+                # Polled rather than listen()ed so the client's socket timeout never fires while idle.
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                sender, _, keys = message['data'].decode('utf-8').partition('|')
+                if sender != _instance_id:
+                    for key in keys.split('\n'):
+                        local_cache.delete(key)
+        except Exception as e:
+            _listener_ready.clear()
+            logger.error(f"Cache invalidation listener error: {e}")
+        finally:
+            pubsub.close()
+        time.sleep(5)
+
+def _ensure_listener():
+    global _listener_started
+    if _listener_started or not LOCAL_CACHE_INVALIDATION:
+        return
+    with _listener_lock:
+        if not _listener_started:
+            threading.Thread(target=_listen_for_invalidations, name="cache-invalidation", daemon=True).start()
+            _listener_started = True
+
+def get_many(keys, local=True):
+    """
+    Fetch several keys, from process memory where possible and in one Redis round trip otherwise
+
+    Args:
+        keys (list): Redis keys
+        local (bool): Use the in-process tier; pass False for one-off bulk
+            reads that would only evict hot entries, or reads that must
+            see another worker's write immediately
+
+    Returns:
+        list: Values (bytes) in key order; missing keys (or errors) give None
+    """
+    if not keys:
+        return []
+    if not local:
+        try:
+            return r.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis mget error: {e}")
+            return [None] * len(keys)
+
+    _ensure_listener()
+    values = [local_cache.get(key) for key in keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    redis_hits = 0
+    if missing:
+        try:
+            fetched = r.mget([keys[i] for i in missing])
+        except Exception as e:
+            logger.error(f"Redis mget error: {e}")
+            fetched = None
+        for i, value in zip(missing, fetched or ()):
+            if value is not None:
+                values[i] = value
+                local_cache.set(keys[i], value)
+                redis_hits += 1
+            elif LOCAL_CACHE_INVALIDATION and _listener_ready.is_set():
+                local_cache.set(keys[i], MISSING, LOCAL_CACHE_NEGATIVE_TTL)
+    _count(len(keys) - len(missing), len(missing), redis_hits, len(missing) - redis_hits)
+    return [None if value is MISSING else value for value in values]
+
+def set_many(items):
+    """
+    Write (key, value, ttl) triples to both tiers; Redis gets one pipelined round trip. Returns False if Redis failed.
+
+    A value of None deletes the key instead, so a rewrite can drop the key it replaces in the same batch.
+    """
+    if not items:
+        return True
+    written = []
+    deleted = []
+    try:
+        pipe = r.pipeline(transaction=False)
+        for key, value, ttl in items:
+            if value is None:
+                key = key.decode('utf-8') if isinstance(key, bytes) else key
+                pipe.delete(key)
+                deleted.append(key)
+                continue
+            pipe.setex(key, ttl, value)
+            written.append(_as_bytes(key, value) + (_seconds(ttl),))
+        if LOCAL_CACHE_INVALIDATION:
+            pipe.publish(INVALIDATION_CHANNEL, _instance_id + '|' + '\n'.join([key for key, _, _ in written] + deleted))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Redis pipeline set error: {e}")
+        # Never serve locally what Redis may not have.
+        for key, _, _ in written:
+            local_cache.delete(key)
+        for key in deleted:
+            local_cache.delete(key)
+        return False
+    for key, value, ttl in written:
+        local_cache.set(key, value, ttl)
+    for key in deleted:
+        local_cache.delete(key)
+    return True
+
+def delete_many(keys):
+    """Remove keys from both tiers and from other processes' local copies. Returns False if Redis failed."""
+    if not keys:
+        return True
+    for key in keys:
+        local_cache.delete(key)
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.delete(*keys)
+        if LOCAL_CACHE_INVALIDATION:
+            pipe.publish(INVALIDATION_CHANNEL, _instance_id + '|' + '\n'.join(keys))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Redis pipeline delete error: {e}")
+        return False
+    return True
+
+def get_one(key, local=True):
+    return get_many([key], local)[0]
+
+def set_one(key, value, ttl):
+    return set_many([(key, value, ttl)])
@@ -1,8 +1,34 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import ARRAY
 
 db = SQLAlchemy()
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Recycle before the server or a proxy (e.g. PgBouncer, managed Postgres) drops idle connections.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+def engine_options(database_url):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for one process
+
+    Each gunicorn worker gets its own pool, so the database sees up to
+    workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    """
+    options = {'pool_pre_ping': True}
+    # SQLite's pools take no sizing arguments.
+    if not database_url.startswith('sqlite'):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
 class User(db.Model):
     __tablename__ = 'users'
 
@@ -11,7 +37,8 @@ class User(db.Model):
     email = db.Column(db.String(150), unique=True, nullable=False, index=True)
     password = db.Column(db.String(255), nullable=False)
     location = db.Column(db.String(100), nullable=True)
-    preferred_domains = db.Column(ARRAY(db.String))
+    # JSON on SQLite, which has no arrays, so local and load-test databases need no Postgres.
+    preferred_domains = db.Column(ARRAY(db.String).with_variant(db.JSON, 'sqlite'))
 
     def __init__(self, name, email, password, location, preferred_domains=None):
         self.name = name
@@ -0,0 +1,180 @@
+"""
+Article cache entries.
+
+Scraped article bodies are stored under a hashed key in a small versioned
+envelope:
+
+    b"NLA" | version (1 byte) | codec (1 byte) | compressed msgpack payload
+
+The payload carries the text, a hash of it, and the validators the site
+sent (ETag / Last-Modified) so stale entries can be revalidated with a
+conditional request instead of a full re-download. zstd is used when the
+zstandard package is installed, zlib otherwise; either codec is readable
+on decode. Entries written before the envelope existed (plain UTF-8 text
+under article_cache:{url}) are still readable while
+ARTICLE_CACHE_READ_LEGACY is on, and get rewritten in the new format
+(dropping the old key) the next time they are served.
+"""
+import os
+import time
+import zlib
+import hashlib
+import logging
+from datetime import timedelta
+
+import msgpack
+
+from cache import r, url_digest
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# How long an entry is kept at all, and how long it is served without revalidating.
+ARTICLE_CACHE_TTL = timedelta(hours=int(os.getenv("ARTICLE_CACHE_TTL_HOURS", "72")))
+ARTICLE_FRESH_FOR = timedelta(hours=int(os.getenv("ARTICLE_FRESH_HOURS", "24")))
+ARTICLE_COMPRESSION_LEVEL = int(os.getenv("ARTICLE_COMPRESSION_LEVEL", "6"))
+
+ENVELOPE_MAGIC = b"NLA"
+ENVELOPE_VERSION = 1
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+LEGACY_PREFIX = "article_cache:"
+# TTL plain-text entries were written with; bounds how old one can be.
+LEGACY_TTL = timedelta(hours=24)
+# Also look up the plain-text key on every read. Turn off once LEGACY_TTL
+# has passed since the envelope shipped, or after `worker.py --migrate-cache`.
+ARTICLE_CACHE_READ_LEGACY = os.getenv("ARTICLE_CACHE_READ_LEGACY", "1") == "1"
+
+def article_key(url):
+    return f"article:v{ENVELOPE_VERSION}:{url_digest(url)}"
+
+def legacy_article_key(url):
+    return f"{LEGACY_PREFIX}{url}"
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def make_entry(text, etag=None, last_modified=None, fetched_at=None):
+    return {
+        'text': text,
+        'hash': text_hash(text),
+        'etag': etag,
+        'last_modified': last_modified,
+        'fetched_at': time.time() if fetched_at is None else fetched_at,
+    }
+
+def _compress(payload):
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=ARTICLE_COMPRESSION_LEVEL).compress(payload)
+    return CODEC_ZLIB, zlib.compress(payload, ARTICLE_COMPRESSION_LEVEL)
+
+def _decompress(codec, body):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec == CODEC_ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"unsupported article codec {codec!r}")
+
+def encode_entry(entry):
+    payload = msgpack.packb([
+        entry['text'], entry['hash'], entry.get('etag'), entry.get('last_modified'), entry['fetched_at'],
+    ], use_bin_type=True)
+    codec, body = _compress(payload)
+    return ENVELOPE_MAGIC + bytes([ENVELOPE_VERSION]) + codec + body
+
+def decode_entry(value):
+    """
+    Decode a stored envelope
+
+    Args:
+        value (bytes): Raw Redis value, or None
+
+    Returns:
+        dict: The entry, or None if missing, unreadable or failing its hash check
+    """
+    if not value or not value.startswith(ENVELOPE_MAGIC) or value[3] != ENVELOPE_VERSION:
+        return None
+    try:
+        text, digest, etag, last_modified, fetched_at = msgpack.unpackb(_decompress(value[4:5], value[5:]), raw=False)
+    except Exception as e:
+        logger.error(f"Unreadable article cache entry: {e}")
+        return None
+    if text_hash(text) != digest:
+        logger.error("Article cache entry failed its hash check")
+        return None
+    return {'text': text, 'hash': digest, 'etag': etag, 'last_modified': last_modified, 'fetched_at': fetched_at}
+
+def decode_legacy(value):
+    """
+    Wrap a plain-text entry from before the envelope; marked so callers rewrite it
+
+    Its age is unknown without a TTL lookup, so fetched_at is back-dated by
+    the full LEGACY_TTL: the rewritten entry is revalidated no later than
+    the plain-text one would have expired (see migrate_legacy_entries).
+    """
+    if not value:
+        return None
+    entry = make_entry(value.decode('utf-8'), fetched_at=time.time() - LEGACY_TTL.total_seconds())
+    entry['legacy'] = True
+    return entry
+
+def cached_entry(value, legacy_value):
+    return decode_entry(value) or decode_legacy(legacy_value)
+
+def is_fresh(entry):
+    return time.time() - entry['fetched_at'] < ARTICLE_FRESH_FOR.total_seconds()
+
+def entry_write(url, entry):
+    """(key, value, ttl) triple for cache.set_many."""
+    entry = {k: v for k, v in entry.items() if k != 'legacy'}
+    return (article_key(url), encode_entry(entry), ARTICLE_CACHE_TTL)
+
+def legacy_rewrite(url, entry):
+    """cache.set_many items that store a legacy entry as an envelope and delete the plain-text key."""
+    return [entry_write(url, entry), (legacy_article_key(url), None, None)]
+
+def migrate_legacy_entries(batch_size=500):
+    """
+    Rewrite every plain-text article_cache:{url} entry as an envelope
+
+    Entries keep their remaining lifetime: fetched_at is back-dated from
+    LEGACY_TTL so they are revalidated when they would have
+    expired anyway.
+
+    Returns:
+        int: Number of entries migrated
+    """
+    migrated = 0
+    keys = []
+
+    def flush():
+        nonlocal migrated
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        results = pipe.execute()
+        pipe = r.pipeline(transaction=False)
+        for key, value, ttl in zip(keys, results[0::2], results[1::2]):
+            if not value:
+                continue
+            url = key.decode('utf-8')[len(LEGACY_PREFIX):]
+            age = max(0, LEGACY_TTL.total_seconds() - ttl) if ttl and ttl > 0 else 0
+            new_key, new_value, new_ttl = entry_write(url, make_entry(value.decode('utf-8'), fetched_at=time.time() - age))
+            pipe.setex(new_key, new_ttl, new_value)
+            pipe.delete(key)
+            migrated += 1
+        pipe.execute()
+        keys.clear()
+
+    for key in r.scan_iter(match=f"{LEGACY_PREFIX}*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            flush()
+    if keys:
+        flush()
+    return migrated
@@ -0,0 +1,78 @@
+"""
+Slim list payloads and the full-article store behind /article/<id>.
+
+List endpoints send each article as a list view: LIST_FIELDS plus a
+short snippet of the scraped text, a few hundred bytes instead of the
+whole body. The full article is written to Redis under its id whenever
+it is (re)processed, alongside the processed-article cache entry and for
+at least as long, and fetched when the reader opens it. Clients that still
+need every field in the list ask for view "full".
+"""
+import os
+import re
+import json
+from datetime import timedelta
+
+from cache import get_one, set_many, url_digest
+from modules.processed_cache import PROCESSED_CACHE_TTL
+
+# Never shorter than the processed cache: a processed hit is not re-stored.
+FULL_ARTICLE_TTL = max(timedelta(hours=int(os.getenv("FULL_ARTICLE_TTL_HOURS", "24"))), PROCESSED_CACHE_TTL)
+SNIPPET_CHARS = int(os.getenv("SNIPPET_CHARS", "280"))
+# "list" or "full"; lets the slim payload roll out ahead of a client update.
+DEFAULT_ARTICLE_VIEW = os.getenv("DEFAULT_ARTICLE_VIEW", "list")
+
+LIST_FIELDS = ('id', 'url', 'title', 'description', 'urlToImage', 'source', 'publishedAt', 'sentiment', 'alternate_sources')
+
+_ARTICLE_ID = re.compile(r'^[0-9a-f]{40}$')
+
+def article_id(url):
+    return url_digest(url)
+
+def is_article_id(aid):
+    return bool(_ARTICLE_ID.match(aid or ''))
+
+def full_article_key(aid):
+    return f"article_full:{aid}"
+
+def requested_view(data):
+    view = (data or {}).get('view') or DEFAULT_ARTICLE_VIEW
+    return 'full' if view == 'full' else 'list'
+
+def snippet(text, limit=SNIPPET_CHARS):
+    if not text or len(text) <= limit:
+        return text or ''
+    return text[:limit].rsplit(' ', 1)[0].rstrip(' ,;:.') + '…'
+
+def list_view(article):
+    slim = {field: article[field] for field in LIST_FIELDS if field in article}
+    slim['snippet'] = snippet(article.get('content'))
+    return slim
+
+def full_article_entry(article, ttl=FULL_ARTICLE_TTL):
+    """(key, value, ttl) storing a processed article for /article/<id>; tags it with its id."""
+    article['id'] = article_id(article['url'])
+    return full_article_key(article['id']), json.dumps(article), ttl
+
+def store_articles(articles, ttl=FULL_ARTICLE_TTL):
+    """Keep full articles for /article/<id>; one pipelined write."""
+    set_many([full_article_entry(article, ttl) for article in articles if article.get('url')])
+
+def present(articles, view):
+    """
+    Articles as a list endpoint returns them
+
+    Args:
+        articles (list): Processed articles
+        view (str): 'list' for the slim view, 'full' for every field
+
+    Returns:
+        list: Article payloads for the response
+    """
+    if view == 'full':
+        return articles
+    return [list_view(article) for article in articles]
+
+def get_article(aid):
+    value = get_one(full_article_key(aid))
+    return json.loads(value) if value else None
@@ -1,7 +1,106 @@
-from modules.scrape_article import scrape_article
-from bs4 import BeautifulSoup
+import os
 import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from cache import get_many, set_many
+from modules.scrape_article import fetch_article, scrape_failure_key, SCRAPE_FAILURE_TTL
+from modules.domain_health import domain_of, get_state
+from modules.article_cache import (
+    ARTICLE_CACHE_READ_LEGACY, article_key, legacy_article_key, cached_entry, is_fresh, entry_write, legacy_rewrite
+)
+from modules.instrumentation import stage, bind
+
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "32"))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv("SCRAPE_PER_HOST_LIMIT", "2"))
+SCRAPE_PAGE_DEADLINE = float(os.getenv("SCRAPE_PAGE_DEADLINE", "12"))
+# Threads for cleaning and sentiment scoring, kept apart from the scrape pool.
+CPU_MAX_WORKERS = int(os.getenv("CPU_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Shared by every request in the worker so the number of scraping threads
+# stays bounded no matter how many pages are being served at once. Fetches
+# are blocking, one thread each, so SCRAPE_MAX_WORKERS is the most scrapes
+# a worker process has in flight (at most SCRAPE_PER_HOST_LIMIT per host);
+# pages coordinate them on one event loop per process (pipeline.run_sync).
+scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_MAX_WORKERS, thread_name_prefix="scrape")
+# CPU-bound stages (HTML cleaning, sentiment) run here so they never take a
+# slot a network fetch could use.
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_MAX_WORKERS, thread_name_prefix="cpu")
+
+class HostLimiter:
+    """
+    Runs jobs on an executor with at most `limit` per host in flight
+
+    Jobs over a host's limit wait in a queue here, not in a pool thread,
+    so one slow publisher holds at most `limit` threads while other
+    hosts' work keeps flowing. Cancelling a queued job's future drops it.
+    """
+
+    def __init__(self, executor, limit):
+        self._executor = executor
+        self._limit = limit
+        self._lock = threading.Lock()
+        self._active = {}
+        self._queues = {}
+
+    def submit(self, host, fn, *args):
+        """Schedule fn(*args) for host; returns a concurrent.futures.Future."""
+        future = Future()
+        # Bound now: a queued job is started from whichever thread frees the slot.
+        job = (future, bind(fn), args)
+        with self._lock:
+            if self._active.get(host, 0) < self._limit:
+                self._active[host] = self._active.get(host, 0) + 1
+            else:
+                self._queues.setdefault(host, deque()).append(job)
+                return future
+        self._start(host, job)
+        return future
+
+    def _start(self, host, job):
+        future, fn, args = job
+
+        def run():
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                self._release(host)
+
+        self._executor.submit(run)
+
+    def _release(self, host):
+        next_job = None
+        with self._lock:
+            queue = self._queues.get(host)
+            while queue and next_job is None:
+                job = queue.popleft()
+                if not job[0].cancelled():
+                    next_job = job
+            if queue is not None and not queue:
+                del self._queues[host]
+            if next_job is None:
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+        if next_job is not None:
+            self._start(host, next_job)
+
+scrape_hosts = HostLimiter(scrape_executor, SCRAPE_PER_HOST_LIMIT)
+
+def url_host(url):
+    return urlparse(url).netloc.lower()
 
 def clean_title(title, source_name):
     if not title:
@@ -12,40 +111,206 @@ def clean_title(title, source_name):
         cleaned = cleaned[:-len(source_name)].strip()
     return cleaned.strip()
 
+# Scraped text is normally plain already; only markup or entities need a parse.
+_MARKUP_RE = re.compile(r'<[A-Za-z/!?]|&(#\d+|#[xX][0-9A-Fa-f]+|[A-Za-z][A-Za-z0-9]*);?')
+
 def clean_and_format_content(raw_content):
-    soup = BeautifulSoup(raw_content, "html.parser")
-    text = soup.get_text(separator="\n")
+    with stage("clean"):
+        return _clean_and_format_content(raw_content)
+
+def _clean_and_format_content(raw_content):
+    if _MARKUP_RE.search(raw_content):
+        soup = BeautifulSoup(raw_content, "html.parser")
+        text = soup.get_text(separator="\n")
+    else:
+        text = raw_content
     paragraphs = [re.sub(r'\s+', ' ', para).strip() for para in text.splitlines() if para.strip()]
     formatted_text = "\n\n".join(paragraphs)
     return formatted_text
 
-def fetch_full_content(api_response):
-    for article in api_response.get('articles', []):
-        url = article.get('url')
-        if url:
+def format_published_at(article):
+    published_at = article.get('publishedAt')
+    if published_at:
+        try:
+            dt = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
+            article['published_date'] = dt.strftime("%Y-%m-%d")
+            article['published_time'] = dt.strftime("%H:%M:%S")
+        except Exception:
+            article['published_date'] = published_at
+            article['published_time'] = ""
+    else:
+        article['published_date'] = ""
+        article['published_time'] = ""
+
+def scrape_within_deadline(url, deadline, cached=None):
+    """Returns (finished, entry); finished is False if the deadline passed before the fetch could start."""
+    # The page may have given up on us while we waited in the host queue.
+    if time.monotonic() >= deadline:
+        return False, None
+    return True, fetch_article(url, cached)
+
+def needs_fetch(cached):
+    """Whether resolving this cache entry takes a network round trip."""
+    return cached is None or (not cached.get('legacy') and not is_fresh(cached))
+
+def resolve_article(url, cached, deadline):
+    """
+    Article text for one URL plus the cache writes it produced
+
+    Fresh entries are served as they are and old-format entries are
+    rewritten as envelopes; stale ones are revalidated, falling back to
+    the stale text if the site fails or the deadline passes.
+
+    Args:
+        url (str): Article URL
+        cached (dict): Article cache entry, or None on a miss
+        deadline (float): time.monotonic() value the fetch must start by,
+            or None to fetch without one
+
+    Returns:
+        tuple: (text, writes); text is "" if the scrape failed and None
+            if it did not finish in time
+    """
+    if cached is not None and cached.get('legacy'):
+        return cached['text'], legacy_rewrite(url, cached)
+    if not needs_fetch(cached):
+        return cached['text'], []
+    if get_state(domain_of(url))['open']:
+        # A skip, not a failure: no scrape_failed marker, which would outlast the circuit.
+        return (cached['text'] if cached else ""), []
+
+    if deadline is None:
+        finished, entry = True, fetch_article(url, cached)
+    else:
+        finished, entry = scrape_within_deadline(url, deadline, cached)
+    if entry is not None:
+        return entry['text'], [entry_write(url, entry)]
+    if cached is not None:
+        return cached['text'], []
+    if not finished:
+        return None, []
+    return "", [(scrape_failure_key(url), b"1", SCRAPE_FAILURE_TTL)]
+
+def _write_late(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    set_many(future.result()[1])
+
+def write_when_done(future):
+    """
+    Have an abandoned scrape still cache what it fetched
+
+    For a resolve_article future the page stopped waiting on: its writes
+    are issued from the pool thread that finishes it, so the next request
+    for a slow publisher is a cache hit instead of another late scrape.
+    A future cancelled before it started writes nothing.
+    """
+    future.add_done_callback(_write_late)
+
+def _resolve_page(urls, cached, concurrent, deadline, use_cache=True):
+    """Resolve every URL of a page; returns (texts, writes)."""
+    deadline = SCRAPE_PAGE_DEADLINE if deadline is None else deadline
+    expires_at = time.monotonic() + deadline
+    texts = [None] * len(urls)
+    writes = []
+
+    futures = {}
+    for index, (url, entry) in enumerate(zip(urls, cached)):
+        if not url:
+            continue
+        if concurrent and needs_fetch(entry):
+            futures[scrape_hosts.submit(url_host(url), resolve_article, url, entry, expires_at)] = index
+            continue
+        try:
+            # Only sequential scrapes reach the network here, and those have never had a deadline.
+            texts[index], new_writes = resolve_article(url, entry, None)
+            writes.extend(new_writes)
+        except Exception:
+            texts[index] = None
+
+    if futures:
+        done, not_done = wait(futures, timeout=deadline)
+        for future in not_done:
+            if not future.cancel() and use_cache:
+                write_when_done(future)
+            # Serve whatever stale copy we had rather than nothing.
+            entry = cached[futures[future]]
+            texts[futures[future]] = entry['text'] if entry else None
+        for future in done:
             try:
-                raw_content = scrape_article(url)
-                article['content'] = clean_and_format_content(raw_content)
+                texts[futures[future]], new_writes = future.result()
+                writes.extend(new_writes)
             except Exception:
-                article['content'] = None
-        else:
+                texts[futures[future]] = None
+    return texts, writes
+
+def read_page_cache(urls, key_funcs):
+    """One MGET covering every (url, key_func) pair; returns one column per key_func."""
+    indexed = [i for i, url in enumerate(urls) if url]
+    values = get_many([key_func(urls[i]) for key_func in key_funcs for i in indexed])
+    columns = []
+    for n in range(len(key_funcs)):
+        column = [None] * len(urls)
+        for j, i in enumerate(indexed):
+            column[i] = values[n * len(indexed) + j]
+        columns.append(column)
+    return columns
+
+def read_article_cache(urls, extra_key_funcs=()):
+    """
+    Article cache entries for a page, plus any extra key columns, in one MGET
+
+    Returns:
+        list: [entries, *extra_columns]
+    """
+    if not ARTICLE_CACHE_READ_LEGACY:
+        envelopes, *extra = read_page_cache(urls, [article_key, *extra_key_funcs])
+        return [[cached_entry(value, None) for value in envelopes], *extra]
+    envelopes, legacy, *extra = read_page_cache(urls, [article_key, legacy_article_key, *extra_key_funcs])
+    return [[cached_entry(value, old) for value, old in zip(envelopes, legacy)], *extra]
+
+def scrape_articles(urls, deadline=None, use_cache=True, concurrent=True):
+    """
+    Scrape several URLs, reading and writing the article cache in one round trip each
+
+    Args:
+        urls (list): Article URLs; falsy entries are skipped
+        deadline (float): Seconds the scrapes may take
+        use_cache (bool): Serve from / populate the article cache
+        concurrent (bool): Scrape on the shared pool instead of one by one
+
+    Returns:
+        list: Raw article text per URL; "" where the scrape failed and
+            None where it did not finish before the deadline
+    """
+    if not use_cache:
+        return _resolve_page(urls, [None] * len(urls), concurrent, deadline, use_cache=False)[0]
+
+    [cached] = read_article_cache(urls)
+    texts, writes = _resolve_page(urls, cached, concurrent, deadline)
+    set_many(writes)
+    return texts
+
+def scrape_article(url, use_cache=True):
+    """
+    Text of one article, through the same cache rules as scrape_articles
+
+    Returns:
+        str: Raw article text, or "" if it could not be scraped
+    """
+    return scrape_articles([url], use_cache=use_cache, concurrent=False)[0] or ""
+
+def apply_content(article, raw_content):
+    if raw_content is not None:
+        try:
+            article['content'] = clean_and_format_content(raw_content)
+        except Exception:
             article['content'] = None
-            
-        original_title = article.get('title', '')
-        source_name = article.get('source', {}).get('name', '')
-        article['title'] = clean_title(original_title, source_name)
+    else:
+        article['content'] = None
 
-        published_at = article.get('publishedAt')
-        if published_at:
-            try:
-                dt = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
-                article['published_date'] = dt.strftime("%Y-%m-%d")
-                article['published_time'] = dt.strftime("%H:%M:%S")
-            except Exception:
-                article['published_date'] = published_at
-                article['published_time'] = ""
-        else:
-            article['published_date'] = ""
-            article['published_time'] = ""
-            
-    return api_response
\ No newline at end of file
+    original_title = article.get('title', '')
+    source_name = article.get('source', {}).get('name', '')
+    article['title'] = clean_title(original_title, source_name)
+
+    format_published_at(article)
@@ -0,0 +1,56 @@
+import os
+import re
+import hashlib
+
+import numpy as np
+
+# Maximum Hamming distance between 64-bit SimHashes for two articles to be one story.
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "10"))
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+def simhash(text):
+    """64-bit SimHash over word 3-shingles of the text."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    digests = b"".join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), 64)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int("".join('1' if v > 0 else '0' for v in votes), 2)
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def source_entry(article):
+    return {
+        'source': (article.get('source') or {}).get('name'),
+        'url': article.get('url'),
+        'title': article.get('title'),
+    }
+
+class PageClusters:
+    """
+    Groups the articles of one result page into near-duplicate clusters
+
+    The first article seen for a story becomes its representative; later
+    near-duplicates are recorded under its alternate_sources.
+    """
+
+    def __init__(self, max_distance=SIMHASH_MAX_DISTANCE):
+        self._max_distance = max_distance
+        self._representatives = []
+
+    def add(self, article):
+        """Register an article; returns True if it duplicates one already on the page."""
+        fingerprint = simhash(article.get('content'))
+        for other_fingerprint, representative in self._representatives:
+            if hamming(fingerprint, other_fingerprint) <= self._max_distance:
+                representative['alternate_sources'].append(source_entry(article))
+                return True
+        article.setdefault('alternate_sources', [])
+        self._representatives.append((fingerprint, article))
+        return False
@@ -0,0 +1,150 @@
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+from cache import r
+from modules.http_client import HTTP_READ_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_EWMA_ALPHA = float(os.getenv("DOMAIN_EWMA_ALPHA", "0.2"))
+DOMAIN_FAILURE_THRESHOLD = float(os.getenv("DOMAIN_FAILURE_THRESHOLD", "0.6"))
+DOMAIN_MIN_REQUESTS = int(os.getenv("DOMAIN_MIN_REQUESTS", "5"))
+DOMAIN_MAX_CONSECUTIVE_FAILURES = int(os.getenv("DOMAIN_MAX_CONSECUTIVE_FAILURES", "5"))
+DOMAIN_OPEN_SECONDS = int(os.getenv("DOMAIN_OPEN_SECONDS", "600"))
+DOMAIN_STATS_TTL = int(os.getenv("DOMAIN_STATS_TTL", str(7 * 24 * 3600)))
+# Read timeout = latency EWMA x multiplier, clamped to [min, HTTP_READ_TIMEOUT].
+DOMAIN_TIMEOUT_MULTIPLIER = float(os.getenv("DOMAIN_TIMEOUT_MULTIPLIER", "3"))
+DOMAIN_MIN_TIMEOUT = float(os.getenv("DOMAIN_MIN_TIMEOUT", "2"))
+# How long a worker trusts its local copy of a domain's state.
+DOMAIN_STATE_REFRESH = float(os.getenv("DOMAIN_STATE_REFRESH", "10"))
+
+INDEX_KEY = "domain_stats:index"
+
+# Atomically fold one scrape result into the domain's running stats and
+# open the circuit when the domain keeps failing. Only a failure can open
+# the circuit; a success after it has been opened (the half-open probe)
+# closes it and clears the failure history.
+_RECORD_SCRIPT = """
+local key, index = KEYS[1], KEYS[2]
+local host = ARGV[1]
+local alpha, latency, ok, now = tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local threshold, min_requests, max_consecutive = tonumber(ARGV[6]), tonumber(ARGV[7]), tonumber(ARGV[8])
+local open_seconds, ttl = tonumber(ARGV[9]), tonumber(ARGV[10])
+
+local stats = redis.call('HMGET', key, 'latency_ewma_ms', 'failure_rate', 'requests', 'consecutive_failures', 'opened_until')
+local requests = (tonumber(stats[3]) or 0) + 1
+local failed = 1 - ok
+local failure_rate = tonumber(stats[2])
+if ok == 1 and stats[5] then
+    failure_rate = 0
+    redis.call('HDEL', key, 'opened_until')
+elseif failure_rate == nil then failure_rate = failed
+else failure_rate = alpha * failed + (1 - alpha) * failure_rate end
+local consecutive = 0
+if ok == 0 then consecutive = (tonumber(stats[4]) or 0) + 1 end
+
+redis.call('HSET', key, 'failure_rate', tostring(failure_rate), 'requests', requests,
+           'consecutive_failures', consecutive, 'updated_at', tostring(now))
+redis.call('HINCRBY', key, 'failures', failed)
+local ewma = tonumber(stats[1])
+if ok == 1 then
+    if ewma == nil then ewma = latency else ewma = alpha * latency + (1 - alpha) * ewma end
+    redis.call('HSET', key, 'latency_ewma_ms', tostring(ewma))
+end
+if ok == 0 and ((requests >= min_requests and failure_rate >= threshold) or consecutive >= max_consecutive) then
+    redis.call('HSET', key, 'opened_until', tostring(now + open_seconds))
+end
+redis.call('EXPIRE', key, ttl)
+redis.call('ZADD', index, now, host)
+-- The fields get_state reads, so the caller can refresh its local copy without another round trip.
+return {ewma and tostring(ewma) or false, redis.call('HGET', key, 'opened_until')}
+"""
+
+_local_states = {}
+_local_states_lock = threading.Lock()
+
+def domain_of(url):
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def stats_key(host):
+    return f"domain_stats:{host}"
+
+def _decode(raw):
+    return {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v for k, v in raw.items()}
+
+def _state_from_stats(stats):
+    now = time.time()
+    ewma = float(stats['latency_ewma_ms']) if stats.get('latency_ewma_ms') else None
+    timeout = HTTP_READ_TIMEOUT
+    if ewma is not None:
+        timeout = min(HTTP_READ_TIMEOUT, max(DOMAIN_MIN_TIMEOUT, ewma / 1000 * DOMAIN_TIMEOUT_MULTIPLIER))
+    return {
+        'open': float(stats.get('opened_until') or 0) > now,
+        'timeout': timeout,
+    }
+
+def get_state(host):
+    """
+    Circuit state and adaptive read timeout for a domain
+
+    Returns:
+        dict: {'open': bool, 'timeout': float}; a closed circuit with the
+            default timeout if the stats cannot be read
+    """
+    now = time.monotonic()
+    with _local_states_lock:
+        cached = _local_states.get(host)
+    if cached and now - cached[0] < DOMAIN_STATE_REFRESH:
+        return cached[1]
+    try:
+        state = _state_from_stats(_decode(r.hgetall(stats_key(host))))
+    except Exception as e:
+        logger.error(f"Redis domain stats error: {e}")
+        state = {'open': False, 'timeout': HTTP_READ_TIMEOUT}
+    with _local_states_lock:
+        _local_states[host] = (now, state)
+    return state
+
+def record_result(host, latency_seconds, ok):
+    try:
+        ewma, opened_until = r.eval(
+            _RECORD_SCRIPT, 2, stats_key(host), INDEX_KEY,
+            host, DOMAIN_EWMA_ALPHA, latency_seconds * 1000, 1 if ok else 0, time.time(),
+            DOMAIN_FAILURE_THRESHOLD, DOMAIN_MIN_REQUESTS, DOMAIN_MAX_CONSECUTIVE_FAILURES,
+            DOMAIN_OPEN_SECONDS, DOMAIN_STATS_TTL
+        )
+    except Exception as e:
+        logger.error(f"Redis domain stats update error: {e}")
+        return
+    state = _state_from_stats(_decode({'latency_ewma_ms': ewma, 'opened_until': opened_until}))
+    with _local_states_lock:
+        _local_states[host] = (time.monotonic(), state)
+
+def all_domain_stats(limit=200):
+    """Most recently scraped domains with their stats, worst failure rate first."""
+    hosts = [h.decode() if isinstance(h, bytes) else h for h in r.zrevrange(INDEX_KEY, 0, limit - 1)]
+    pipe = r.pipeline(transaction=False)
+    for host in hosts:
+        pipe.hgetall(stats_key(host))
+    domains = []
+    for host, raw in zip(hosts, pipe.execute()):
+        if not raw:
+            continue
+        stats = _decode(raw)
+        state = _state_from_stats(stats)
+        domains.append({
+            'domain': host,
+            'requests': int(stats.get('requests', 0)),
+            'failures': int(stats.get('failures', 0)),
+            'failure_rate': round(float(stats.get('failure_rate', 0)), 3),
+            'latency_ewma_ms': round(float(stats['latency_ewma_ms']), 1) if stats.get('latency_ewma_ms') else None,
+            'timeout': round(state['timeout'], 2),
+            'circuit_open': state['open'],
+            'opened_until': float(stats.get('opened_until') or 0) or None,
+        })
+    domains.sort(key=lambda d: (-d['failure_rate'], d['domain']))
+    return domains
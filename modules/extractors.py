@@ -0,0 +1,151 @@
+import os
+import logging
+from io import BytesIO
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_BACKEND = os.getenv("EXTRACTOR_BACKEND", "lxml")
+
+STRIP_TAGS = frozenset(['script', 'style', 'nav', 'footer', 'aside', 'header', 'iframe'])
+CONTAINER_CLASSES = frozenset(['article-content', 'post-content', 'entry-content', 'content', 'article-body'])
+CONTAINER_IDS = frozenset(['article', 'content', 'main-content'])
+
+def extract_with_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+    
+    for tag in soup(list(STRIP_TAGS)):
+        tag.decompose()
+    
+    selectors = [
+        'article',
+        {'class': list(CONTAINER_CLASSES)},
+        {'id': list(CONTAINER_IDS)}
+    ]
+    
+    article_content = None
+    for selector in selectors:
+        if isinstance(selector, str):
+            article_content = soup.find(selector)
+        else:
+            article_content = soup.find('div', selector)
+        if article_content:
+            break
+    
+    if article_content:
+        paragraphs = article_content.find_all("p")
+    else:
+        paragraphs = soup.find_all("p")
+    
+    return "\n".join(p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True))
+
+def _paragraph_text(element, parts):
+    # Mirrors Tag.get_text(strip=True): every text node stripped and
+    # concatenated, skipping comments and the tags bs4 would have decomposed.
+    if element.text and isinstance(element.tag, str) and element.tag not in STRIP_TAGS:
+        parts.append(element.text.strip())
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in STRIP_TAGS:
+            _paragraph_text(child, parts)
+        if child.tail:
+            parts.append(child.tail.strip())
+    return parts
+
+def extract_with_lxml(html):
+    """
+    Single-pass extraction with lxml's HTML iterparse
+
+    Selects paragraphs with the same precedence as extract_with_bs4 (first
+    <article>, then the first content-class <div>, then the first
+    content-id <div>, else every <p>), but collects all candidates while
+    streaming and frees finished subtrees as it goes.
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+
+    # Paragraphs seen inside each candidate container, plus all of them.
+    found = {'article': [], 'class': [], 'id': [], 'all': []}
+    # The first container of each kind and whether we are inside it.
+    claimed = {'article': None, 'class': None, 'id': None}
+    stripped_depth = 0
+    paragraph_depth = 0
+
+    for event, element in etree.iterparse(BytesIO(html), events=('start', 'end'), html=True, recover=True):
+        tag = element.tag if isinstance(element.tag, str) else None
+
+        if event == 'start':
+            if tag in STRIP_TAGS:
+                stripped_depth += 1
+            elif stripped_depth == 0:
+                if tag == 'p':
+                    paragraph_depth += 1
+                elif tag == 'article' and claimed['article'] is None:
+                    claimed['article'] = element
+                elif tag == 'div':
+                    if claimed['class'] is None and CONTAINER_CLASSES.intersection((element.get('class') or '').split()):
+                        claimed['class'] = element
+                    if claimed['id'] is None and element.get('id') in CONTAINER_IDS:
+                        claimed['id'] = element
+            continue
+
+        if tag in STRIP_TAGS:
+            stripped_depth -= 1
+        elif stripped_depth == 0 and tag == 'p':
+            paragraph_depth -= 1
+            if paragraph_depth == 0:
+                text = "".join(_paragraph_text(element, []))
+                if text:
+                    found['all'].append(text)
+                    for kind, container in claimed.items():
+                        if container is not None and container is not False and _is_ancestor(container, element):
+                            found[kind].append(text)
+
+        for kind, container in claimed.items():
+            if container is element:
+                # Closed: later paragraphs can no longer belong to it.
+                claimed[kind] = False
+
+        if paragraph_depth == 0 and tag is not None:
+            element.clear(keep_tail=True)
+
+    for kind in ('article', 'class', 'id'):
+        if claimed[kind] is not None:
+            return "\n".join(found[kind])
+    return "\n".join(found['all'])
+
+def _is_ancestor(container, element):
+    parent = element.getparent()
+    while parent is not None:
+        if parent is container:
+            return True
+        parent = parent.getparent()
+    return False
+
+EXTRACTORS = {
+    'bs4': extract_with_bs4,
+    'lxml': extract_with_lxml,
+}
+
+def extract_article_text(html, backend=None):
+    """
+    Pull the article body out of a page's HTML
+
+    Args:
+        html (bytes | str): Raw page
+        backend (str): 'lxml' or 'bs4'; defaults to EXTRACTOR_BACKEND
+
+    Returns:
+        str: Paragraph texts joined by newlines. Falls back to the
+            BeautifulSoup extractor if the fast path fails or finds nothing.
+    """
+    backend = backend or EXTRACTOR_BACKEND
+    if backend != 'bs4':
+        try:
+            text = EXTRACTORS[backend](html)
+            if text:
+                return text
+        except Exception as e:
+            logger.warning(f"{backend} extractor failed, falling back to bs4: {e}")
+    return extract_with_bs4(html)
@@ -0,0 +1,160 @@
+"""
+Materialized per-topic news feeds.
+
+The prefetch worker runs one NewsAPI query per popular topic and stores
+the processed, filtered articles as a Redis sorted set per topic
+(article id -> publish time), with the articles themselves kept in
+modules.article_store. A /news request for a set of topics then reads
+one page of the merged feed: the union of its topics' sets is built
+once, shared by every user with the same canonical topic set for
+FEED_UNION_TTL seconds, and paged with ZREVRANGE, so serving a page
+costs O(page) instead of a NewsAPI query and a scraping pipeline.
+Upstream queries scale with distinct topics rather than with users or
+topic combinations.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from cache import r, get_many
+from modules.queries import canonical_topics
+from modules.article_store import full_article_key, store_articles
+
+logger = logging.getLogger(__name__)
+
+# Newest articles kept per topic.
+FEED_MAX_ITEMS = int(os.getenv("FEED_MAX_ITEMS", "500"))
+# A topic the worker stops refreshing drops out after this long.
+FEED_TTL = timedelta(hours=int(os.getenv("FEED_TTL_HOURS", "6")))
+# Articles published longer ago leave the feed; matches the /news query window.
+FEED_WINDOW = timedelta(days=int(os.getenv("FEED_WINDOW_DAYS", "3")))
+FEED_UNION_TTL = int(os.getenv("FEED_UNION_TTL", "60"))
+
+# KEYS[1] is the feed to page through; for a topic set, KEYS[2..] are its
+# topics' feeds, unioned into KEYS[1] unless a recent union is still there.
+# Returns {-1} if any topic has not been materialized, else {total, ids...}.
+_PAGE_SCRIPT = """
+if #KEYS > 1 and redis.call('exists', KEYS[1]) == 0 then
+    for i = 2, #KEYS do
+        if redis.call('exists', KEYS[i]) == 0 then
+            return {-1}
+        end
+    end
+    -- MAX, not the default SUM: an article in two topics keeps its publish time.
+    local args = {KEYS[1], #KEYS - 1}
+    for i = 2, #KEYS do
+        table.insert(args, KEYS[i])
+    end
+    table.insert(args, 'AGGREGATE')
+    table.insert(args, 'MAX')
+    redis.call('zunionstore', unpack(args))
+    redis.call('expire', KEYS[1], ARGV[3])
+end
+local total = redis.call('zcard', KEYS[1])
+if total == 0 then
+    return {-1}
+end
+local page = redis.call('zrevrange', KEYS[1], ARGV[1], ARGV[2])
+table.insert(page, 1, total)
+return page
+"""
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def topic_key(topic):
+    return f"feed:topic:{_digest(topic)}"
+
+def topic_set_key(topics):
+    return f"feed:set:{_digest(' OR '.join(topics))}"
+
+def _published_ts(article):
+    try:
+        return datetime.strptime(article.get('publishedAt') or '', "%Y-%m-%dT%H:%M:%SZ").timestamp()
+    except ValueError:
+        return time.time()
+
+def materialize_topic(topic, articles):
+    """
+    Add processed articles to a topic's feed, trimming it to FEED_MAX_ITEMS
+
+    Article records are kept for FEED_WINDOW from each refresh and ids
+    leave the feed FEED_WINDOW after publication, so a record outlives
+    its id in the feed.
+
+    Args:
+        topic (str): Topic as a user would pick it; canonicalized here
+        articles (list): Processed articles that passed the endpoint filter
+
+    Returns:
+        int: Number of articles added or refreshed
+    """
+    [topic] = canonical_topics([topic])
+    articles = [article for article in articles if article.get('url')]
+    if not articles:
+        return 0
+
+    store_articles(articles, ttl=FEED_WINDOW)
+    key = topic_key(topic)
+    pipe = r.pipeline(transaction=False)
+    pipe.zadd(key, {article['id']: _published_ts(article) for article in articles})
+    pipe.zremrangebyscore(key, '-inf', time.time() - FEED_WINDOW.total_seconds())
+    pipe.zremrangebyrank(key, 0, -(FEED_MAX_ITEMS + 1))
+    pipe.expire(key, FEED_TTL)
+    pipe.execute()
+    return len(articles)
+
+def _remove_ids(keys, ids):
+    try:
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrem(key, *ids)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Feed cleanup failed: {e}")
+
+def read_feed(topics, page, page_size):
+    """
+    One page of the merged, newest-first feed for a set of topics
+
+    Args:
+        topics (list): The user's preferred topics, in any order or case
+        page (int): 1-based page number
+        page_size (int): Articles per page
+
+    Returns:
+        dict: {'articles', 'totalResults'}; pages past the end of the
+            feed are empty, so paging never switches ranking midway.
+            None when a topic has not been materialized or an article
+            record has gone missing; the caller should then query
+            NewsAPI directly
+    """
+    topics = canonical_topics(topics)
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        return None
+    if not topics or page < 1:
+        return None
+    keys = [topic_key(topics[0])] if len(topics) == 1 else [topic_set_key(topics)] + [topic_key(t) for t in topics]
+    start = (page - 1) * page_size
+    try:
+        result = r.eval(_PAGE_SCRIPT, len(keys), *keys, start, start + page_size - 1, FEED_UNION_TTL)
+    except Exception as e:
+        logger.error(f"Feed read failed: {e}")
+        return None
+
+    total = int(result[0])
+    if total < 0:
+        return None
+    ids = [aid.decode('utf-8') if isinstance(aid, bytes) else aid for aid in result[1:]]
+    values = get_many([full_article_key(aid) for aid in ids])
+    missing = [aid for aid, value in zip(ids, values) if not value]
+    if missing:
+        # A short page with a stale total would be worse than the live path; drop the ids so the next read is whole.
+        _remove_ids(keys, missing)
+        return None
+    return {'articles': [json.loads(value) for value in values], 'totalResults': total}
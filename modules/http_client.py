@@ -0,0 +1,138 @@
+import os
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br" responses)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.3"))
+# Article scrapes only retry failed connects: a read timeout or a 429/5xx
+# (whatever its Retry-After) fails at once and is left to the per-domain
+# circuit breaker, so a bad host cannot hold a scrape thread for minutes.
+HTTP_SCRAPE_CONNECT_RETRIES = int(os.getenv("HTTP_SCRAPE_CONNECT_RETRIES", "1"))
+# Number of distinct hosts whose connection pools are kept alive, and the
+# number of keep-alive connections kept per host.
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "50"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "4"))
+# Per-host overrides, e.g. "newsapi.org=10,generativelanguage.googleapis.com=4"
+HTTP_HOST_POOL_SIZES = os.getenv("HTTP_HOST_POOL_SIZES", "newsapi.org=10")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_scrape_session = None
+_session_lock = threading.Lock()
+
+def _parse_host_pool_sizes(value):
+    sizes = {}
+    for item in value.split(','):
+        host, _, size = item.strip().partition('=')
+        if host and size.isdigit():
+            sizes[host.strip().lower()] = int(size)
+    return sizes
+
+def _api_retry():
+    return Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def _scrape_retry():
+    return Retry(
+        total=HTTP_SCRAPE_CONNECT_RETRIES,
+        connect=HTTP_SCRAPE_CONNECT_RETRIES,
+        read=0,
+        status=0,
+        other=0,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+
+def _make_adapter(pool_maxsize, retry):
+    return HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_maxsize, max_retries=retry)
+
+def _build_session(make_retry, host_pool_sizes=None):
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+    default_adapter = _make_adapter(HTTP_POOL_PER_HOST, make_retry())
+    session.mount("http://", default_adapter)
+    session.mount("https://", default_adapter)
+    for host, size in (host_pool_sizes or {}).items():
+        session.mount(f"https://{host}/", _make_adapter(size, make_retry()))
+    return session
+
+def get_session():
+    """Return the process-wide pooled session for API calls, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(_api_retry, _parse_host_pool_sizes(HTTP_HOST_POOL_SIZES))
+                logger.info("HTTP session pool initialised.")
+    return _session
+
+def get_scrape_session():
+    """Return the process-wide pooled session for article scrapes, creating it on first use."""
+    global _scrape_session
+    if _scrape_session is None:
+        with _session_lock:
+            if _scrape_session is None:
+                _scrape_session = _build_session(_scrape_retry)
+    return _scrape_session
+
+def _timeout(timeout):
+    if timeout is None:
+        return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if not isinstance(timeout, tuple):
+        return (min(HTTP_CONNECT_TIMEOUT, timeout), timeout)
+    return timeout
+
+def get(url, timeout=None, **kwargs):
+    """
+    GET through the shared keep-alive session
+
+    Args:
+        url (str): URL to fetch
+        timeout (float | tuple): Read timeout, or (connect, read) pair;
+            defaults to HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT
+
+    Returns:
+        requests.Response: Response after retries on connection errors,
+            429 and 5xx responses
+    """
+    return get_session().get(url, timeout=_timeout(timeout), **kwargs)
+
+def scrape_get(url, timeout=None, **kwargs):
+    """
+    GET an article page through the shared scrape session
+
+    Same as get, but only failed connects are retried (see
+    HTTP_SCRAPE_CONNECT_RETRIES); the response to a 429 or 5xx is
+    returned as is.
+    """
+    return get_scrape_session().get(url, timeout=_timeout(timeout), **kwargs)
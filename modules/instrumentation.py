@@ -0,0 +1,263 @@
+"""
+Request-scoped timing of the hot path.
+
+Code wraps its expensive steps in `with stage("name"):`. Each stage is
+recorded in two places:
+
+- the current request's breakdown, which is sent back as a
+  Server-Timing header and logged as one JSON line per request;
+- a process-wide latency histogram, exposed in Prometheus text format
+  by render_metrics() for the /metrics endpoint.
+
+The per-request recorder lives in a contextvar. asyncio.to_thread
+propagates it on its own; work handed to a thread pool directly must go
+through submit() or bind() so its stages are charged to the request that
+queued it. Outside a request, for example in the prefetch worker, stages
+only feed the histograms.
+
+Metrics are per process; with several gunicorn workers each one serves
+its own counts, as Prometheus expects from separate targets.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("newslens.request")
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1") == "1"
+REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "1") == "1"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class RequestTimings:
+    """Total seconds and call count per stage for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total = self.stages.get(name)
+            if total is None:
+                self.stages[name] = [seconds, 1]
+            else:
+                total[0] += seconds
+                total[1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: (seconds, count) for name, (seconds, count) in self.stages.items()}
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REQUEST_SECONDS = Histogram(
+    "newslens_http_request_duration_seconds", "Time to produce a response, by endpoint.", ("endpoint", "method", "status"))
+STAGE_SECONDS = Histogram(
+    "newslens_stage_duration_seconds", "Time spent in each instrumented stage.", ("stage",))
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+def current_timings():
+    return _current.get()
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as `name` for the current request and the stage histogram."""
+    if not INSTRUMENTATION_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe((name,), elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+def timed(name):
+    """Decorator form of stage()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def bind(fn):
+    """fn bound to the caller's context, for loop.run_in_executor and other thread hand-offs."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's request timings."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+class TimedRedis:
+    """
+    Redis client proxy that times every command as the "redis" stage
+
+    Pipelines are timed once, on execute(). Attributes that are not
+    commands (pubsub, connection_pool, ...) pass through untouched.
+    """
+
+    _PASSTHROUGH = frozenset(("pubsub", "connection_pool", "register_script", "scan_iter", "lock", "close"))
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in self._PASSTHROUGH or not callable(attr):
+            return attr
+        if name == "pipeline":
+            return lambda *args, **kwargs: _TimedPipeline(attr(*args, **kwargs))
+
+        def command(*args, **kwargs):
+            with stage("redis"):
+                return attr(*args, **kwargs)
+        return command
+
+class _TimedPipeline:
+    def __init__(self, pipe):
+        self._pipe = pipe
+
+    def __getattr__(self, name):
+        return getattr(self._pipe, name)
+
+    def execute(self, *args, **kwargs):
+        with stage("redis"):
+            return self._pipe.execute(*args, **kwargs)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instrumentation_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["instrumentation_started"].pop()
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(("db",), elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.add("db", elapsed)
+
+def server_timing_header(timings):
+    parts = [
+        f'{name};dur={seconds * 1000:.1f}' + (f';desc="{count} calls"' if count > 1 else "")
+        for name, (seconds, count) in sorted(timings.snapshot().items())
+    ]
+    parts.append(f"total;dur={(time.perf_counter() - timings.started) * 1000:.1f}")
+    return ", ".join(parts)
+
+def init_app(app):
+    """Install the per-request hooks on a Flask app and time every SQLAlchemy query."""
+    from flask import g, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not INSTRUMENTATION_ENABLED:
+        return
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_timings():
+        g.timings = RequestTimings()
+        g.timings_token = _current.set(g.timings)
+
+    @app.after_request
+    def finish_timings(response):
+        timings = g.get("timings")
+        if timings is None:
+            return response
+        elapsed = time.perf_counter() - timings.started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        if REQUEST_LOG_ENABLED:
+            request_logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 1),
+                "stages": {name: {"ms": round(seconds * 1000, 1), "calls": count}
+                           for name, (seconds, count) in timings.snapshot().items()},
+            }))
+        return response
+
+    @app.teardown_request
+    def reset_timings(exc):
+        token = g.pop("timings_token", None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Set in a different context (e.g. the request ran in a copied one).
+                _current.set(None)
+
+def render_metrics(counters=None, gauges=None):
+    """
+    Every histogram in Prometheus text format
+
+    Args:
+        counters (dict): Extra {metric_name: value} counters to append
+        gauges (dict): Extra {metric_name: value} gauges to append
+
+    Returns:
+        str: The exposition text
+    """
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+    for kind, values in (("counter", counters), ("gauge", gauges)):
+        for name, value in sorted((values or {}).items()):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
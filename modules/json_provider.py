@@ -0,0 +1,40 @@
+"""
+Flask JSON provider backed by orjson.
+
+orjson serializes a page of articles several times faster than the
+standard library and writes bytes, so responses skip an encode step.
+Without orjson installed, or when pretty-printing is asked for, it
+behaves exactly like Flask's default provider. Types orjson does not
+know (and datetimes, so they keep Flask's HTTP-date format) go through
+the default provider's conversion.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+class OrjsonProvider(DefaultJSONProvider):
+
+    def _orjson_dumps(self, obj, option=0):
+        return orjson.dumps(obj, default=self.default, option=_OPTIONS | option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._orjson_dumps(obj, orjson.OPT_APPEND_NEWLINE), mimetype=self.mimetype)
@@ -2,29 +2,31 @@ import os
 import requests
 from dotenv import load_dotenv
 
+from modules import http_client
+from modules.instrumentation import stage
+from modules.result_cache import get_or_fetch, refresh, params_cache_key
+
 load_dotenv()
 
 NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
-BASE_URL = "https://newsapi.org/v2"
+# Overridable so load tests can point at a local stand-in (see benchmarks/loadtest.py).
+BASE_URL = os.getenv("NEWSAPI_BASE_URL", "https://newsapi.org/v2")
 
-def get_articles(params):
-    """
-    Fetch news articles from NewsAPI
-    
-    Args:
-        params (dict): Query parameters for the API
-        
-    Returns:
-        dict: API response with articles
-    """
+NEWSAPI_CACHE_TTL = int(os.getenv("NEWSAPI_CACHE_TTL", "300"))
+NEWSAPI_CACHE_STALE_TTL = int(os.getenv("NEWSAPI_CACHE_STALE_TTL", "1800"))
+
+def _is_ok(api_response):
+    return api_response.get('status') == 'ok'
+
+def _request(endpoint, params):
     try:
-        response = requests.get(
-            f"{BASE_URL}/everything",
-            params=params,
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()
+        with stage("newsapi"):
+            response = http_client.get(
+                f"{BASE_URL}/{endpoint}",
+                params=params
+            )
+            response.raise_for_status()
+            return response.json()
     
     except requests.exceptions.Timeout:
         return {
@@ -39,34 +41,41 @@ def get_articles(params):
             "articles": []
         }
 
-def top_headlines(params):
+def _cached_request(endpoint, params, use_cache, force_refresh=False):
+    if not use_cache:
+        return _request(endpoint, params)
+    return (refresh if force_refresh else get_or_fetch)(
+        params_cache_key(f"newsapi:{endpoint}", params),
+        lambda: _request(endpoint, params),
+        ttl=NEWSAPI_CACHE_TTL,
+        stale_ttl=NEWSAPI_CACHE_STALE_TTL,
+        cacheable=_is_ok
+    )
+
+def get_articles(params, use_cache=True, force_refresh=False):
+    """
+    Fetch news articles from NewsAPI
+    
+    Args:
+        params (dict): Query parameters for the API
+        use_cache (bool): Serve from / populate the shared query cache
+        force_refresh (bool): Skip the cache read but still store the result
+        
+    Returns:
+        dict: API response with articles
+    """
+    return _cached_request("everything", params, use_cache, force_refresh)
+
+def top_headlines(params, use_cache=True, force_refresh=False):
     """
     Fetch top headlines from NewsAPI
     
     Args:
         params (dict): Query parameters for the API
+        use_cache (bool): Serve from / populate the shared query cache
+        force_refresh (bool): Skip the cache read but still store the result
         
     Returns:
         dict: API response with top headlines
     """
-    try:
-        response = requests.get(
-            f"{BASE_URL}/top-headlines",
-            params=params,
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()
-    
-    except requests.exceptions.Timeout:
-        return {
-            "status": "error",
-            "message": "Request timed out",
-            "articles": []
-        }
-    except requests.exceptions.RequestException as e:
-        return {
-            "status": "error",
-            "message": str(e),
-            "articles": []
-        }
\ No newline at end of file
+    return _cached_request("top-headlines", params, use_cache, force_refresh)
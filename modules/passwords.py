@@ -0,0 +1,64 @@
+"""
+bcrypt hashing on a small dedicated pool.
+
+Hashing costs a few hundred milliseconds of CPU. Running it inline let a
+burst of logins take every core from the news endpoints; here at most
+PASSWORD_HASH_WORKERS hashes run at once (bcrypt releases the GIL while
+it works), at most PASSWORD_HASH_QUEUE more may wait, and anything
+beyond that is turned away with PasswordHasherBusy instead of queueing.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from modules.instrumentation import stage, submit
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Half the cores by default so hashing can never take all of them.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(2 * PASSWORD_HASH_WORKERS)))
+# How long a request may wait for a free slot. Waiting requests hold a
+# server thread, so the default is to turn them away at once.
+PASSWORD_HASH_WAIT = float(os.getenv("PASSWORD_HASH_WAIT", "0"))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+class PasswordHasherBusy(Exception):
+    """Every hashing slot is taken; the caller should answer 503."""
+
+def _run(fn, *args):
+    if PASSWORD_HASH_WAIT > 0:
+        acquired = _slots.acquire(timeout=PASSWORD_HASH_WAIT)
+    else:
+        acquired = _slots.acquire(blocking=False)
+    if not acquired:
+        raise PasswordHasherBusy()
+    try:
+        with stage("bcrypt"):
+            return submit(_executor, fn, *args).result()
+    finally:
+        _slots.release()
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+def hash_password(password):
+    """bcrypt hash of password at BCRYPT_ROUNDS; raises PasswordHasherBusy when saturated."""
+    return _run(_hash, password)
+
+def check_password(password, hashed):
+    """Whether password matches hashed; raises PasswordHasherBusy when saturated."""
+    return _run(_check, password, hashed)
+
+def needs_rehash(hashed):
+    """True when hashed was made with a different cost factor than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
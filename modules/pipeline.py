@@ -0,0 +1,305 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from cache import set_many
+from modules.content import (
+    SCRAPE_PAGE_DEADLINE, cpu_executor, scrape_hosts, url_host, needs_fetch, resolve_article, write_when_done, read_page_cache, read_article_cache, apply_content
+)
+from modules.scrape_article import scrape_failure_key
+from modules.processed_cache import content_digest, processed_key, unpack_processed, processed_cache_entry
+from modules.sentiment import score_documents
+from modules.related_index import index_in_background
+from modules.dedup import PageClusters
+from modules.article_store import article_id, full_article_entry
+from modules.instrumentation import bind
+
+BLOCKED_DOMAINS = frozenset(d.strip().lower() for d in os.getenv("BLOCKED_DOMAINS", "").split(",") if d.strip())
+# Results NewsAPI will page through for this key; developer keys stop at 100.
+NEWSAPI_MAX_RESULTS = int(os.getenv("NEWSAPI_MAX_RESULTS", "100"))
+# Articles ready for scoring within this many seconds of each other share one score_documents call.
+SENTIMENT_BATCH_WINDOW = float(os.getenv("SENTIMENT_BATCH_WINDOW", "0.01"))
+NEWSAPI_MAX_PAGE_SIZE = 100
+# Threads behind asyncio.to_thread on the pipeline loop: cache reads and
+# writes, NewsAPI calls (which may wait on a coalesced fetch) and prefiltering.
+PIPELINE_IO_WORKERS = int(os.getenv("PIPELINE_IO_WORKERS", "32"))
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _pipeline_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(ThreadPoolExecutor(max_workers=PIPELINE_IO_WORKERS, thread_name_prefix="pipeline-io"))
+                threading.Thread(target=loop.run_forever, daemon=True, name="pipeline-loop").start()
+                _loop = loop
+    return _loop
+
+def run_sync(coro):
+    """
+    Run a pipeline coroutine on the process-wide event loop and wait for it
+
+    Views stay synchronous and only coordinate here: one loop per process,
+    started on first use, instead of a new loop per request. The caller's
+    contextvars (the request's stage timings) carry over to the task.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _pipeline_loop()).result()
+
+def keep_article(article):
+    """Final filter applied by every news endpoint."""
+    return bool(article.get('content') and article.get('urlToImage'))
+
+def _is_blocked(host):
+    return any(host == domain or host.endswith('.' + domain) for domain in BLOCKED_DOMAINS)
+
+def passes_metadata_filters(article):
+    """Cheap checks that need no scraping: image present, not removed, domain allowed."""
+    url = article.get('url')
+    if not url or not article.get('urlToImage'):
+        return False
+    if article.get('title') == '[Removed]':
+        return False
+    host = (urlparse(url).hostname or '').lower()
+    if host == 'removed.com' or _is_blocked(host):
+        return False
+    return True
+
+def prefilter_articles(articles, use_cache=True):
+    """Drop articles that fail the metadata filters or failed to scrape recently."""
+    candidates = [article for article in articles if passes_metadata_filters(article)]
+    if use_cache and candidates:
+        [failed] = read_page_cache([article['url'] for article in candidates], [scrape_failure_key])
+        candidates = [article for article, failure in zip(candidates, failed) if not failure]
+    return candidates
+
+class PageScorer:
+    """
+    Scores the articles of one page in batches
+
+    The first article to arrive opens a SENTIMENT_BATCH_WINDOW batch and
+    everything arriving within it (typically the page's cache hits) is
+    scored in one score_documents call; a slow scrape just starts another
+    batch, so streaming never waits for it.
+    """
+
+    def __init__(self, window=SENTIMENT_BATCH_WINDOW):
+        self._window = window
+        self._pending = []
+        self._tasks = set()
+
+    async def score(self, article):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((article, future))
+        if len(self._pending) == 1:
+            loop.call_later(self._window, self._flush)
+        await future
+
+    def _flush(self):
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            sentiments = await loop.run_in_executor(
+                cpu_executor, bind(score_documents), [article.get('content') for article, _ in batch])
+        except Exception as e:
+            sentiments, error = [None] * len(batch), e
+        else:
+            error = None
+        for (article, future), sentiment in zip(batch, sentiments):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                article['sentiment'] = sentiment
+                future.set_result(None)
+
+async def _process_one(article, cached_article, packed, expires_at, use_cache, clusters, scorer, writes, fresh):
+    """Scrape, clean, deduplicate and score one article; returns (article, is_duplicate)."""
+    loop = asyncio.get_running_loop()
+    url = article.get('url')
+
+    raw_content = None
+    if url:
+        article['id'] = article_id(url)
+        if needs_fetch(cached_article):
+            future = scrape_hosts.submit(url_host(url), resolve_article, url, cached_article, expires_at)
+            try:
+                raw_content, new_writes = await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # The page gave up on this scrape; cache it anyway if it still finishes.
+                if use_cache:
+                    write_when_done(future)
+                raise
+        else:
+            raw_content, new_writes = resolve_article(url, cached_article, expires_at)
+        if use_cache:
+            writes.extend(new_writes)
+
+    digest = content_digest(article, raw_content) if use_cache and raw_content else None
+    cached = unpack_processed(packed, digest) if digest and packed else None
+    if cached is not None:
+        article.update(cached)
+    else:
+        await loop.run_in_executor(cpu_executor, bind(apply_content), article, raw_content)
+
+    # Collapse syndicated copies before spending CPU on their sentiment.
+    if keep_article(article) and clusters.add(article):
+        return article, True
+
+    if cached is None:
+        await scorer.score(article)
+        if digest:
+            writes.append(processed_cache_entry(url, digest, article))
+            if keep_article(article):
+                fresh.append(article)
+    return article, False
+
+async def stream_articles(api_response, deadline=None, use_cache=True, index_related=True):
+    """
+    Scrape and process a page of articles, yielding each as soon as it is ready
+
+    Cache lookups for the whole page happen in one MGET up front; each
+    miss is then scraped and cleaned independently and scored in small
+    batches (see PageScorer), so one slow site never holds back the rest.
+    Near-duplicate stories are collapsed into the first copy ready, which
+    lists the others under alternate_sources. New cache entries, including
+    the full-article records behind /article/<id> for articles processed
+    here, are written in one pipeline once the page is finished or
+    abandoned.
+
+    Args:
+        api_response (dict): NewsAPI response; articles are updated in place
+        deadline (float): Seconds the whole page may take
+        use_cache (bool): Read and write the article caches
+        index_related (bool): Queue the processed articles for the related-article index
+
+    Yields:
+        dict: Processed articles that pass keep_article, in completion order
+    """
+    deadline = SCRAPE_PAGE_DEADLINE if deadline is None else deadline
+    expires_at = time.monotonic() + deadline
+    articles = api_response.get('articles', [])
+    urls = [article.get('url') for article in articles]
+
+    if use_cache:
+        cached_articles, cached_processed = await asyncio.to_thread(read_article_cache, urls, [processed_key])
+    else:
+        cached_articles = cached_processed = [None] * len(urls)
+
+    writes = []
+    fresh = []
+    clusters = PageClusters()
+    scorer = PageScorer()
+    tasks = [
+        asyncio.ensure_future(_process_one(article, cached_article, packed, expires_at, use_cache, clusters, scorer, writes, fresh))
+        for article, cached_article, packed in zip(articles, cached_articles, cached_processed)
+    ]
+    try:
+        for next_article in asyncio.as_completed(tasks, timeout=max(0.0, expires_at - time.monotonic())):
+            try:
+                article, is_duplicate = await next_article
+            except asyncio.TimeoutError:
+                break
+            except Exception:
+                continue
+            if keep_article(article) and not is_duplicate:
+                yield article
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Serialized only now, once duplicates found later are under alternate_sources.
+        writes.extend(full_article_entry(article) for article in fresh)
+        if writes:
+            await asyncio.to_thread(set_many, list(writes))
+        if index_related:
+            index_in_background([task.result()[0] for task in tasks if task.done() and not task.cancelled() and not task.exception()])
+
+def _as_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+async def fetch_page(fetch, params, use_cache=True):
+    """
+    Fetch a NewsAPI page and drop articles not worth scraping
+
+    Articles are fetched in windows of 100 (one cached upstream call per
+    window, shared by every client page inside it) and prefiltered; page N
+    is then the Nth pageSize slice of the filtered list, so pages stay
+    disjoint and no article that passes the filters is skipped.
+    totalResults counts what is reachable: every filtered article once all
+    windows up to NEWSAPI_MAX_RESULTS are fetched, otherwise the filtered
+    articles so far plus the raw ones not yet fetched.
+
+    Args:
+        fetch (callable): get_articles or top_headlines
+        params (dict): NewsAPI params
+
+    Returns:
+        dict: The NewsAPI response, with articles prefiltered when status is 'ok'
+    """
+    page = max(_as_int(params.get('page'), 1), 1)
+    page_size = _as_int(params.get('pageSize'), 20)
+    start, end = (page - 1) * page_size, page * page_size
+
+    api_response, kept, fetched, reachable = None, [], 0, 0
+    window = 1
+    while True:
+        window_response = await asyncio.to_thread(fetch, dict(params, page=window, pageSize=NEWSAPI_MAX_PAGE_SIZE))
+        if window_response.get('status') != 'ok':
+            if api_response is None:
+                return window_response
+            break
+        api_response = window_response
+        raw = api_response.get('articles', [])
+        reachable = min(_as_int(api_response.get('totalResults'), 0), NEWSAPI_MAX_RESULTS)
+        fetched += len(raw)
+        kept.extend(await asyncio.to_thread(prefilter_articles, raw, use_cache))
+        if len(kept) >= end or not raw or fetched >= reachable:
+            break
+        window += 1
+
+    api_response['articles'] = kept[start:end]
+    api_response['totalResults'] = len(kept) + max(0, reachable - fetched)
+    return api_response
+
+async def process_page(api_response, deadline=None, use_cache=True, index_related=True):
+    """
+    Run a fetched NewsAPI page through stream_articles
+
+    Returns:
+        dict: The same response, with articles reduced to the processed
+            ones that passed the filter, in NewsAPI order
+    """
+    ready = set()
+    async for article in stream_articles(api_response, deadline=deadline, use_cache=use_cache, index_related=index_related):
+        ready.add(id(article))
+    api_response['articles'] = [a for a in api_response.get('articles', []) if id(a) in ready]
+    return api_response
+
+def iter_sync(async_iterable):
+    """Drive an async iterator on the pipeline loop from synchronous code, e.g. a streaming WSGI response."""
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield run_sync(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        if hasattr(iterator, 'aclose'):
+            run_sync(iterator.aclose())
@@ -0,0 +1,91 @@
+import os
+import hashlib
+import logging
+from datetime import timedelta
+
+import msgpack
+
+from cache import r, get_many, url_digest
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_CACHE_TTL = timedelta(hours=int(os.getenv("PROCESSED_CACHE_TTL_HOURS", "24")))
+
+PROCESSED_PREFIX = "processed_article:"
+
+def processed_key(url):
+    return f"{PROCESSED_PREFIX}{url_digest(url)}"
+
+def content_digest(article, raw_content):
+    """Hash of everything the processed fields are derived from."""
+    h = hashlib.sha1()
+    for part in (raw_content, article.get('title') or '', (article.get('source') or {}).get('name') or '', article.get('publishedAt') or ''):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def pack_processed(article, digest):
+    sentiment = article.get('sentiment')
+    return msgpack.packb([
+        digest,
+        article.get('content'),
+        article.get('title'),
+        article.get('published_date'),
+        article.get('published_time'),
+        [sentiment['raw_polarity'], sentiment['raw_subjectivity']] if sentiment else None,
+        article.get('url'),
+    ], use_bin_type=True)
+
+def _unpack_record(packed):
+    # Entries written before the URL was stored have six fields.
+    record = msgpack.unpackb(packed, raw=False)
+    return record if len(record) > 6 else record + [None]
+
+def unpack_processed(packed, digest):
+    """Return the processed fields, or None if the entry is for other content."""
+    try:
+        stored_digest, content, title, published_date, published_time, sentiment, _ = _unpack_record(packed)
+    except Exception as e:
+        logger.error(f"Corrupt processed-article entry: {e}")
+        return None
+    if stored_digest != digest:
+        return None
+    return {
+        'content': content,
+        'title': title,
+        'published_date': published_date,
+        'published_time': published_time,
+        'sentiment': {'raw_polarity': sentiment[0], 'raw_subjectivity': sentiment[1]} if sentiment else None,
+    }
+
+def processed_cache_entry(url, digest, article):
+    """(key, value, ttl) triple for cache.set_many."""
+    return processed_key(url), pack_processed(article, digest), PROCESSED_CACHE_TTL
+
+def iter_processed_articles(limit, batch_size=200):
+    """
+    Yield up to `limit` cached processed articles as dicts with url,
+    title, content and published date/time; used to warm in-process indexes.
+    """
+    keys = []
+    for key in r.scan_iter(match=f"{PROCESSED_PREFIX}*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= limit:
+            break
+
+    for start in range(0, len(keys), batch_size):
+        for packed in get_many(keys[start:start + batch_size], local=False):
+            if not packed:
+                continue
+            try:
+                _, content, title, published_date, published_time, _, url = _unpack_record(packed)
+            except Exception:
+                continue
+            if url and content:
+                yield {
+                    'url': url,
+                    'title': title,
+                    'content': content,
+                    'published_date': published_date,
+                    'published_time': published_time,
+                }
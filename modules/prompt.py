@@ -0,0 +1,158 @@
+import os
+import re
+import zlib
+import math
+from collections import Counter
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Paragraphs whose estimated Jaccard similarity to an earlier one reaches this are dropped.
+PROMPT_DUPLICATE_THRESHOLD = float(os.getenv("PROMPT_DUPLICATE_THRESHOLD", "0.8"))
+
+SHINGLE_SIZE = 3
+NUM_HASHES = 64
+# LSH banding: only paragraphs agreeing on a whole band are compared. 16 bands of 4
+# miss a pair at 0.8 similarity about once in 4500.
+LSH_BANDS = 16
+_BAND_ROWS = NUM_HASHES // LSH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seeds keep signatures comparable across processes.
+_HASH_PARAMS = [((i * 0x9E3779B1 + 1) % _MERSENNE_PRIME, (i * 0x85EBCA77 + 7) % _MERSENNE_PRIME) for i in range(1, NUM_HASHES + 1)]
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"“])')
+STOPWORDS = frozenset("""a an and are as at be but by for from has have he her his i in is it its of on or
+that the their they this to was were will with which who would said says after also about""".split())
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English prose)."""
+    return max(1, len(text) // 4) if text else 0
+
+def truncate_to_budget(text, token_budget):
+    """Cut text at a word boundary so it fits token_budget."""
+    limit = token_budget * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] or text[:limit]
+
+def _words(text):
+    return _WORD_RE.findall(text.lower())
+
+def minhash(text):
+    """MinHash signature over word shingles, or None for text too short to shingle."""
+    words = _words(text)
+    if len(words) < SHINGLE_SIZE:
+        return None
+    shingles = {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8')) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return [min((a * s + b) % _MERSENNE_PRIME for s in shingles) for a, b in _HASH_PARAMS]
+
+def similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_HASHES
+
+def _bands(signature):
+    return [(band, tuple(signature[band * _BAND_ROWS:(band + 1) * _BAND_ROWS])) for band in range(LSH_BANDS)]
+
+def dedupe_paragraphs(docs, threshold=None):
+    """
+    Drop paragraphs that near-duplicate an earlier one in any doc
+
+    Args:
+        docs (list): Documents with paragraphs separated by blank lines
+        threshold (float): Estimated Jaccard similarity that counts as a duplicate
+
+    Returns:
+        list: One list of surviving paragraphs per document
+    """
+    threshold = PROMPT_DUPLICATE_THRESHOLD if threshold is None else threshold
+    seen = []
+    buckets = {}
+    seen_exact = set()
+    deduped = []
+    for doc in docs:
+        kept = []
+        for paragraph in (p.strip() for p in doc.split("\n\n")):
+            if not paragraph:
+                continue
+            normalized = " ".join(_words(paragraph))
+            if normalized in seen_exact:
+                continue
+            signature = minhash(paragraph)
+            if signature is not None:
+                bands = _bands(signature)
+                candidates = {index for band in bands for index in buckets.get(band, ())}
+                if any(similarity(signature, seen[index]) >= threshold for index in candidates):
+                    continue
+                for band in bands:
+                    buckets.setdefault(band, []).append(len(seen))
+                seen.append(signature)
+            seen_exact.add(normalized)
+            kept.append(paragraph)
+        deduped.append(kept)
+    return deduped
+
+def rank_sentences(paragraphs_by_doc):
+    """
+    Score every sentence by salience
+
+    A sentence scores the mean corpus frequency of its content words,
+    boosted for appearing early in its document, so facts repeated across
+    sources and lead paragraphs rank highest.
+
+    Returns:
+        list: (score, doc_index, position, sentence) tuples
+    """
+    sentences = []
+    for doc_index, paragraphs in enumerate(paragraphs_by_doc):
+        position = 0
+        for paragraph in paragraphs:
+            for sentence in _SENTENCE_RE.split(paragraph):
+                sentence = sentence.strip()
+                if sentence:
+                    sentences.append((doc_index, position, sentence))
+                    position += 1
+
+    frequencies = Counter(w for _, _, sentence in sentences for w in set(_words(sentence)) if w not in STOPWORDS)
+    ranked = []
+    for doc_index, position, sentence in sentences:
+        content_words = [w for w in _words(sentence) if w not in STOPWORDS]
+        if not content_words:
+            continue
+        score = sum(frequencies[w] for w in content_words) / len(content_words)
+        ranked.append((score / math.log2(position + 2), doc_index, position, sentence))
+    return ranked
+
+def assemble_articles_text(docs, token_budget=None):
+    """
+    Deduplicate and trim documents to fit the prompt token budget
+
+    Near-duplicate paragraphs are removed first. If the remainder is still
+    over budget, the most salient sentences are kept and put back in
+    their original document order. When not even one sentence fits, the
+    top-ranked one is cut to the budget rather than sending nothing.
+
+    Returns:
+        str: Article text to embed in the prompt
+    """
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    paragraphs_by_doc = dedupe_paragraphs(docs)
+
+    text = "\n\n".join("\n\n".join(paragraphs) for paragraphs in paragraphs_by_doc if paragraphs)
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    ranked = sorted(rank_sentences(paragraphs_by_doc), key=lambda item: -item[0])
+    chosen = []
+    used = 0
+    for score, doc_index, position, sentence in ranked:
+        cost = estimate_tokens(sentence)
+        if used + cost > token_budget:
+            continue
+        chosen.append((doc_index, position, sentence))
+        used += cost
+    if not chosen:
+        return truncate_to_budget(ranked[0][3] if ranked else text, token_budget)
+
+    chosen.sort()
+    blocks = []
+    for doc_index in sorted({doc_index for doc_index, _, _ in chosen}):
+        blocks.append(" ".join(sentence for d, _, sentence in chosen if d == doc_index))
+    return "\n\n".join(blocks)
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+
+PAGE_SIZE = 20
+
+def canonical_topics(topics):
+    """Sorted, de-duplicated, case-folded topics, so equal preference sets share queries and feeds."""
+    return sorted({topic.strip().lower() for topic in topics or [] if topic and topic.strip()})
+
+def preferences_query(topics):
+    return ' OR '.join(canonical_topics(topics))
+
+def everything_params(query, page, days, api_key):
+    """NewsAPI /everything params as built by the /news and /search endpoints."""
+    from_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    return {'q': query, 'from': from_date, 'language': 'en', 'sortBy': 'relevancy', 'page': page, 'pageSize': PAGE_SIZE, 'apiKey': api_key}
+
+def headline_params(page, api_key):
+    """NewsAPI /top-headlines params as built by the /top-headlines endpoint."""
+    return {'country': 'us', 'page': page, 'pageSize': PAGE_SIZE, 'apiKey': api_key}
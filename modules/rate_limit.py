@@ -0,0 +1,52 @@
+import os
+import time
+import hashlib
+import logging
+
+from cache import r
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+LOGIN_LIMIT_PER_IP = int(os.getenv("LOGIN_LIMIT_PER_IP", "30"))
+LOGIN_LIMIT_PER_EMAIL = int(os.getenv("LOGIN_LIMIT_PER_EMAIL", "5"))
+SIGNUP_LIMIT_PER_IP = int(os.getenv("SIGNUP_LIMIT_PER_IP", "10"))
+
+def client_ip(request):
+    # X-Forwarded-For is client-controlled; app.py applies ProxyFix for the
+    # trusted proxy hops, so remote_addr is the address our proxy saw.
+    return request.remote_addr or "unknown"
+
+def check_limits(scope, limits, window=RATE_LIMIT_WINDOW):
+    """
+    Count one attempt against each (name, identity, limit) and report whether any is exceeded
+
+    Fixed windows in Redis, shared by every worker. If Redis is
+    unavailable the attempt is allowed rather than locking everyone out.
+
+    Args:
+        scope (str): What is being limited, e.g. "login"
+        limits (list): (name, identity, limit) triples, e.g. ("ip", "1.2.3.4", 30)
+        window (int): Window length in seconds
+
+    Returns:
+        int: Seconds until the caller may retry, or 0 if within every limit
+    """
+    now = int(time.time())
+    bucket = now // window
+    keys = [
+        f"ratelimit:{scope}:{name}:{hashlib.sha1(str(identity).lower().encode('utf-8')).hexdigest()}:{bucket}"
+        for name, identity, _ in limits
+    ]
+    try:
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(key)
+            pipe.expire(key, window)
+        counts = pipe.execute()[0::2]
+    except Exception as e:
+        logger.error(f"Rate limit check failed: {e}")
+        return 0
+    if any(count > limit for count, (_, _, limit) in zip(counts, limits)):
+        return (bucket + 1) * window - now
+    return 0
@@ -0,0 +1,242 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+
+from modules.processed_cache import iter_processed_articles
+
+logger = logging.getLogger(__name__)
+
+RELATED_INDEX_FEATURES = int(os.getenv("RELATED_INDEX_FEATURES", str(2 ** 18)))
+RELATED_INDEX_RETENTION_HOURS = float(os.getenv("RELATED_INDEX_RETENTION_HOURS", "72"))
+RELATED_INDEX_COMPACT_INTERVAL = float(os.getenv("RELATED_INDEX_COMPACT_INTERVAL", "600"))
+# Adds between IDF recomputations; in between, new articles use the current weights.
+RELATED_INDEX_REWEIGH_EVERY = int(os.getenv("RELATED_INDEX_REWEIGH_EVERY", "500"))
+RELATED_INDEX_BOOTSTRAP_LIMIT = int(os.getenv("RELATED_INDEX_BOOTSTRAP_LIMIT", "5000"))
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.15"))
+
+def _timestamp(published_date, published_time=""):
+    try:
+        return datetime.strptime(f"{published_date} {published_time or '00:00:00'}", "%Y-%m-%d %H:%M:%S").timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+class RelatedIndex:
+    """
+    Incremental hashed TF-IDF index over processed articles
+
+    Term counts are hashed, so adding a document never changes the
+    vocabulary. IDF weights are frozen between reweighs: a new document
+    is weighted with the current IDF and appended to a small tail, and the
+    whole matrix is reweighted only every RELATED_INDEX_REWEIGH_EVERY adds
+    and after compaction, outside the lock, so queries reuse the weighted
+    matrix instead of rebuilding it. Both run on a background thread, one
+    at a time, so add never waits for them.
+    """
+
+    def __init__(self, n_features=RELATED_INDEX_FEATURES, retention_hours=RELATED_INDEX_RETENTION_HOURS):
+        # sklearn takes most of a second to import; only pay for it once an index is needed.
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self._vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None, stop_words='english')
+        self._retention = retention_hours * 3600
+        self._lock = threading.Lock()
+        self._reweigh_lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        self._rows = []
+        self._entries = []
+        self._positions = {}
+        self._df = np.zeros(n_features)
+        # Weighted rows: self._matrix covers the first rows, self._tail_rows the rest.
+        self._idf = None
+        self._matrix = None
+        self._tail_rows = []
+        self._tail = None
+        self._stale_adds = 0
+        self._generation = 0
+        self._compacted_at = time.time()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, url):
+        return url in self._positions
+
+    def add(self, url, title, text, published_at=None):
+        if not url or not text or url in self._positions:
+            return
+        counts = self._vectorizer.transform([text])
+        with self._lock:
+            if url in self._positions:
+                return
+            self._positions[url] = len(self._entries)
+            self._rows.append(counts)
+            self._entries.append({'url': url, 'title': title, 'published_at': published_at or time.time()})
+            self._df[counts.indices] += 1
+            if self._matrix is not None:
+                self._tail_rows.append(self._weigh(counts, self._idf))
+                self._tail = None
+            self._stale_adds += 1
+            compact = time.time() - self._compacted_at > RELATED_INDEX_COMPACT_INTERVAL
+            reweigh = self._stale_adds >= RELATED_INDEX_REWEIGH_EVERY
+        if compact or reweigh:
+            self._maintain_in_background(compact)
+
+    def _maintain_in_background(self, compact):
+        # Already compacting or reweighing: that run picks up this add too.
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                if compact:
+                    self.compact()
+                else:
+                    self.reweigh()
+            except Exception as e:
+                logger.error(f"Related index maintenance failed: {e}")
+            finally:
+                self._maintenance_lock.release()
+
+        threading.Thread(target=run, daemon=True, name="related-index").start()
+
+    def _weigh(self, counts, idf):
+        weighted = counts.astype(np.float64)
+        weighted.data = np.log1p(weighted.data)
+        weighted = weighted.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ weighted
+
+    def reweigh(self, blocking=True):
+        """Recompute IDF and the weighted matrix from a snapshot, without holding the index lock."""
+        if not self._reweigh_lock.acquire(blocking=blocking):
+            return
+        try:
+            while True:
+                with self._lock:
+                    rows, df, generation = list(self._rows), self._df.copy(), self._generation
+                if not rows:
+                    return
+                idf = np.log((1 + len(rows)) / (1 + df)) + 1
+                matrix = self._weigh(sparse.vstack(rows).tocsr(), idf)
+                with self._lock:
+                    # A compaction renumbered the rows meanwhile; start again from the new ones.
+                    if generation != self._generation:
+                        continue
+                    self._idf = idf
+                    self._matrix = matrix
+                    self._tail_rows = [self._weigh(row, idf) for row in self._rows[len(rows):]]
+                    self._tail = None
+                    self._stale_adds = len(self._tail_rows)
+                    return
+        finally:
+            self._reweigh_lock.release()
+
+    def query(self, text, k=5, window_hours=None, exclude_url=None, min_score=RELATED_MIN_SCORE):
+        """
+        Top-k most similar indexed articles
+
+        Args:
+            text (str): Article text to match
+            k (int): Number of results
+            window_hours (float): Only articles published within this many hours
+            exclude_url (str): Usually the article being matched
+            min_score (float): Minimum cosine similarity
+
+        Returns:
+            list: (score, {'url', 'title', 'published_at'}) pairs, best first
+        """
+        if self._matrix is None:
+            self.reweigh()
+        with self._lock:
+            if not self._entries or self._matrix is None:
+                return []
+            if self._tail is None and self._tail_rows:
+                self._tail = sparse.vstack(self._tail_rows).tocsr()
+            matrix, tail, idf = self._matrix, self._tail if self._tail_rows else None, self._idf
+            entries = list(self._entries)
+            excluded = self._positions.get(exclude_url)
+
+        weighted_query = self._weigh(self._vectorizer.transform([text]), idf).T
+        scores = (matrix @ weighted_query).toarray().ravel()
+        if tail is not None:
+            scores = np.concatenate([scores, (tail @ weighted_query).toarray().ravel()])
+        if window_hours is not None:
+            cutoff = time.time() - window_hours * 3600
+            scores[[entry['published_at'] < cutoff for entry in entries]] = 0
+        if excluded is not None:
+            scores[excluded] = 0
+
+        top = np.argsort(-scores)[:k]
+        return [(float(scores[i]), entries[i]) for i in top if scores[i] >= min_score]
+
+    def compact(self):
+        """Drop articles past the retention window, then reweigh."""
+        cutoff = time.time() - self._retention
+        with self._lock:
+            keep = [i for i, entry in enumerate(self._entries) if entry['published_at'] >= cutoff]
+            if self._matrix is not None:
+                # Keep serving the old weights, renumbered, until the reweigh lands.
+                base = self._matrix.shape[0]
+                self._matrix = self._matrix[[i for i in keep if i < base]]
+                self._tail_rows = [self._tail_rows[i - base] for i in keep if i >= base]
+                self._tail = None
+            self._rows = [self._rows[i] for i in keep]
+            self._entries = [self._entries[i] for i in keep]
+            self._positions = {entry['url']: i for i, entry in enumerate(self._entries)}
+            self._df = np.zeros_like(self._df)
+            for row in self._rows:
+                self._df[row.indices] += 1
+            self._generation += 1
+            self._compacted_at = time.time()
+        self.reweigh()
+
+_index = None
+_bootstrap_lock = threading.Lock()
+# Adds are hashed and applied here, one page at a time, off the request path.
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="related-index")
+
+def _bootstrap():
+    loaded = 0
+    try:
+        for article in iter_processed_articles(RELATED_INDEX_BOOTSTRAP_LIMIT):
+            _index.add(article['url'], article['title'], article['content'],
+                       _timestamp(article['published_date'], article['published_time']))
+            loaded += 1
+    except Exception as e:
+        logger.error(f"Related index bootstrap failed: {e}")
+    logger.info(f"Related index loaded {loaded} cached articles.")
+
+def get_index():
+    """The process-wide index, built on first use and warmed from the processed-article cache in the background."""
+    global _index
+    if _index is None:
+        with _bootstrap_lock:
+            if _index is None:
+                _index = RelatedIndex()
+                threading.Thread(target=_bootstrap, daemon=True).start()
+    return _index
+
+def index_articles(articles):
+    """Add processed articles (with content) to the index."""
+    index = get_index()
+    for article in articles:
+        if article.get('content') and article.get('url') not in index:
+            index.add(article['url'], article.get('title'), article['content'],
+                      _timestamp(article.get('published_date'), article.get('published_time')))
+
+def _index_quietly(articles):
+    try:
+        index_articles(articles)
+    except Exception as e:
+        logger.error(f"Related index update failed: {e}")
+
+def index_in_background(articles):
+    """Queue index_articles without waiting for it."""
+    if articles:
+        _index_executor.submit(_index_quietly, list(articles))
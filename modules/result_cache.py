@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+
+from cache import r, get_one, set_one
+
+logger = logging.getLogger(__name__)
+
+COALESCE_LOCK_TTL_MS = int(os.getenv("COALESCE_LOCK_TTL_MS", "15000"))
+COALESCE_WAIT_SECONDS = float(os.getenv("COALESCE_WAIT_SECONDS", "10"))
+COALESCE_POLL_SECONDS = 0.05
+
+# Delete the lock only if we still own it.
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def params_cache_key(prefix, params):
+    """Stable cache key for a request's query params, ignoring the API key."""
+    normalized = {str(k).lower(): str(v) for k, v in params.items() if str(k).lower() != 'apikey'}
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{prefix}:{digest}"
+
+def _acquire(lock_key, lock_ttl_ms):
+    token = uuid.uuid4().hex
+    if r.set(lock_key, token, nx=True, px=lock_ttl_ms):
+        return token
+    return None
+
+def _release(lock_key, token):
+    try:
+        r.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+    except Exception as e:
+        logger.error(f"Redis lock release error: {e}")
+
+def _read(key, local=True):
+    cached = get_one(key, local)
+    if not cached:
+        return None
+    return json.loads(cached)
+
+def _store(key, value, ttl, stale_ttl):
+    entry = json.dumps({'fetched_at': time.time(), 'value': value})
+    set_one(key, entry, int(ttl + stale_ttl))
+
+def _fetch_and_store(key, fetch, ttl, stale_ttl, cacheable):
+    value = fetch()
+    if cacheable(value):
+        try:
+            _store(key, value, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Redis set error: {e}")
+    return value
+
+def _refresh_in_background(key, lock_key, token, fetch, ttl, stale_ttl, cacheable):
+    def refresh():
+        try:
+            _fetch_and_store(key, fetch, ttl, stale_ttl, cacheable)
+        except Exception as e:
+            logger.error(f"Background refresh failed for {key}: {e}")
+        finally:
+            _release(lock_key, token)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def refresh(key, fetch, ttl, stale_ttl=0, cacheable=lambda value: True):
+    """Fetch unconditionally and overwrite the cached value; used for warm-up."""
+    return _fetch_and_store(key, fetch, ttl, stale_ttl, cacheable)
+
+def get_or_fetch(key, fetch, ttl, stale_ttl=0, cacheable=lambda value: True,
+                 lock_ttl_ms=COALESCE_LOCK_TTL_MS, wait_seconds=COALESCE_WAIT_SECONDS):
+    """
+    Read-through cache with stale-while-revalidate and single-flight fetches
+
+    Concurrent misses for the same key, across processes, wait for the one
+    caller holding the Redis lock instead of all calling fetch().
+
+    Args:
+        key (str): Redis key for the cached value
+        fetch (callable): Produces a fresh, JSON-serializable value
+        ttl (int): Seconds a cached value is served as fresh
+        stale_ttl (int): Further seconds it is served while being refreshed
+        cacheable (callable): Decides whether a fetched value is stored
+        lock_ttl_ms (int): How long the fetching caller holds the lock;
+            must outlast a slow fetch
+        wait_seconds (float): How long other callers wait for that fetch
+            before calling fetch() themselves
+
+    Returns:
+        The cached or freshly fetched value
+    """
+    lock_key = f"lock:{key}"
+    try:
+        entry = _read(key)
+        if entry is not None:
+            if time.time() - entry['fetched_at'] < ttl:
+                return entry['value']
+            token = _acquire(lock_key, lock_ttl_ms)
+            if token:
+                _refresh_in_background(key, lock_key, token, fetch, ttl, stale_ttl, cacheable)
+            return entry['value']
+
+        token = _acquire(lock_key, lock_ttl_ms)
+    except Exception as e:
+        logger.error(f"Redis cache error for {key}: {e}")
+        return fetch()
+
+    if token:
+        try:
+            return _fetch_and_store(key, fetch, ttl, stale_ttl, cacheable)
+        finally:
+            _release(lock_key, token)
+
+    # Someone else is fetching; wait for their result rather than duplicating the call.
+    waited_until = time.monotonic() + wait_seconds
+    while time.monotonic() < waited_until:
+        time.sleep(COALESCE_POLL_SECONDS)
+        try:
+            entry = _read(key, local=False)
+        except Exception:
+            break
+        if entry is not None:
+            return entry['value']
+        try:
+            if not r.exists(lock_key):
+                break
+        except Exception:
+            break
+    return _fetch_and_store(key, fetch, ttl, stale_ttl, cacheable)
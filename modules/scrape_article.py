@@ -1,9 +1,15 @@
+import os
+import time
 import logging
 from datetime import timedelta
-from bs4 import BeautifulSoup
 import requests
 
-from cache import r
+from cache import url_digest
+from modules import http_client
+from modules.extractors import extract_article_text
+from modules.article_cache import make_entry
+from modules.instrumentation import stage
+from modules.domain_health import domain_of, get_state, record_result
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,66 +22,76 @@ HEADERS = {
     )
 }
 
-def scrape_article(url, use_cache=True):
-    cache_key = f"article_cache:{url}"
-    
-    if use_cache:
-        try:
-            cached_content = r.get(cache_key)
-            if cached_content:
-                logger.info(f"Cache hit for: {url}")
-                return cached_content.decode('utf-8')
-        except Exception as e:
-            logger.error(f"Redis get error: {e}")
-            
+# How long a URL that failed to scrape is skipped before being retried.
+SCRAPE_FAILURE_TTL = timedelta(seconds=int(os.getenv("SCRAPE_FAILURE_TTL", "1800")))
+
+def scrape_failure_key(url):
+    return f"scrape_failed:{url_digest(url)}"
+
+def fetch_article(url, cached=None):
+    """
+    Download and extract one article, revalidating a cached copy if given
+
+    When the cached entry carries an ETag or Last-Modified, the request is
+    made conditional and a 304 just renews the cached entry.
+
+    Args:
+        url (str): Article URL
+        cached (dict): Existing article cache entry, if any
+
+    Returns:
+        dict: Article cache entry (see modules.article_cache), or None if
+            the site is circuit-broken or the scrape failed
+    """
+    host = domain_of(url)
+    state = get_state(host)
+    if state['open']:
+        logger.info(f"Circuit open for {host}, skipping: {url}")
+        return None
+
+    headers = dict(HEADERS)
+    if cached and not cached.get('legacy'):
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    started = time.monotonic()
+    entry = None
     try:
         logger.info(f"Scraping article: {url}")
-        
-        response = requests.get(url, headers=HEADERS, timeout=10)
+
+        with stage("scrape.fetch"):
+            response = http_client.scrape_get(url, headers=headers, timeout=state['timeout'])
+        if response.status_code == 304 and cached:
+            logger.info(f"Not modified: {url}")
+            entry = make_entry(
+                cached['text'],
+                etag=response.headers.get('ETag') or cached.get('etag'),
+                last_modified=response.headers.get('Last-Modified') or cached.get('last_modified'),
+            )
+            return entry
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        for tag in soup(['script', 'style', 'nav', 'footer', 'aside', 'header', 'iframe']):
-            tag.decompose()
-        
-        selectors = [
-            'article',
-            {'class': ['article-content', 'post-content', 'entry-content', 'content', 'article-body']},
-            {'id': ['article', 'content', 'main-content']}
-        ]
-        
-        article_content = None
-        for selector in selectors:
-            if isinstance(selector, str):
-                article_content = soup.find(selector)
-            else:
-                article_content = soup.find('div', selector)
-            if article_content:
-                break
-        
-        if article_content:
-            paragraphs = article_content.find_all("p")
-        else:
-            paragraphs = soup.find_all("p")
-        
-        article_text = "\n".join(p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True))
-        
-        if article_text and use_cache:
-            try:
-                r.setex(cache_key, timedelta(hours=24), article_text)
-                logger.info(f"Cached article: {url}")
-            except Exception as e:
-                logger.error(f"Redis set error: {e}")
-        
-        return article_text.strip() if article_text else ""
-    
+
+        with stage("scrape.extract"):
+            article_text = extract_article_text(response.content)
+        if article_text and article_text.strip():
+            entry = make_entry(
+                article_text.strip(),
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+            )
+        return entry
+
     except requests.exceptions.Timeout:
         logger.error(f"Timeout scraping article: {url}")
-        return ""
+        return None
     except requests.exceptions.RequestException as e:
         logger.error(f"Error scraping article at {url}: {e}")
-        return ""
+        return None
     except Exception as e:
         logger.error(f"Unexpected error scraping {url}: {e}")
-        return ""
\ No newline at end of file
+        return None
+    finally:
+        # Paywalls and consent pages come back 200 with nothing to extract; count them as failures too.
+        record_result(host, time.monotonic() - started, entry is not None)
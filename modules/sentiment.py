@@ -1,19 +1,170 @@
-from textblob import TextBlob
-
-def analyze_sentiments(api_response):
-    for article in api_response.get('articles', []):
-        content = article.get('content')
-        
-        if content and isinstance(content, str) and len(content) > 50:
-            try:
-                blob = TextBlob(content)
-                article['sentiment'] = {
-                    'raw_polarity': blob.sentiment.polarity,
-                    'raw_subjectivity': blob.sentiment.subjectivity
-                }
-            except Exception:
-                article['sentiment'] = None
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modules.instrumentation import timed
+
+SENTIMENT_PROCESSES = int(os.getenv("SENTIMENT_PROCESSES", "0"))
+# Batches smaller than this are scored in-process even when a pool is configured.
+SENTIMENT_POOL_MIN_BATCH = int(os.getenv("SENTIMENT_POOL_MIN_BATCH", "200"))
+
+MIN_CONTENT_LENGTH = 50
+
+_model = None
+_model_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _load_model():
+    """
+    Flatten TextBlob's pattern lexicon to {word: (polarity, subjectivity, intensity, is_modifier)}
+
+    TextBlob (and nltk beneath it) is only imported the first time
+    something is scored, so importing this module stays cheap. Concurrent
+    first callers wait for one build rather than each building their own.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _build_model()
+    return _model
+
+def _build_model():
+    from textblob.en import sentiment as pattern_sentiment
+    from textblob._text import EMOTICONS, PUNCTUATION
+
+    lexicon = {}
+    for word in pattern_sentiment.keys():
+        senses = pattern_sentiment[word]
+        if None in senses:
+            p, s, i = senses[None]
+            lexicon[word] = (p, s, i, any(modifier in senses for modifier in pattern_sentiment.modifiers))
+    emoticons = {}
+    for (_, polarity), faces in EMOTICONS.items():
+        for face in faces:
+            emoticons.setdefault(face.lower(), polarity)
+    return (lexicon, emoticons, frozenset(pattern_sentiment.negations), pattern_sentiment.tokenizer, PUNCTUATION)
+
+def _assess(text, lexicon, emoticons, negations, tokenize, punctuation):
+    """
+    Port of pattern's Sentiment.assessments for untagged text
+
+    Returns parallel lists of polarity and subjectivity, one entry per
+    assessed chunk, identical to what TextBlob averages.
+    """
+    polarities, subjectivities, intensities, negated = [], [], [], []
+    modifier = None
+    negation = None
+    for w in " ".join(tokenize(text)).lower().split():
+        entry = lexicon.get(w)
+        if entry is not None:
+            p, s, i, is_modifier = entry
+            if modifier is None:
+                polarities.append(p)
+                subjectivities.append(s)
+                intensities.append(i)
+                negated.append(False)
+            else:
+                polarities[-1] = max(-1.0, min(p * intensities[-1], 1.0))
+                subjectivities[-1] = max(-1.0, min(s * intensities[-1], 1.0))
+                intensities[-1] = i
+            if negation is not None:
+                intensities[-1] = 1.0 / intensities[-1]
+                negated[-1] = True
+            modifier = w if is_modifier else None
+            negation = w if w in negations else None
         else:
-            article['sentiment'] = None
-            
-    return api_response
\ No newline at end of file
+            if w in negations:
+                negation = w
+            elif negation and len(w.strip("'")) > 1:
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith("ly"):
+                negated[-1] = True
+                negation = None
+            elif modifier and len(w) > 2:
+                modifier = None
+            if w == "!" and polarities:
+                polarities[-1] = max(-1.0, min(polarities[-1] * 1.25, 1.0))
+            if w == "(!)":
+                polarities.append(0.0)
+                subjectivities.append(1.0)
+                intensities.append(1.0)
+                negated.append(False)
+            if not w.isalpha() and len(w) <= 5 and w not in punctuation and w in emoticons:
+                polarities.append(emoticons[w])
+                subjectivities.append(1.0)
+                intensities.append(1.0)
+                negated.append(False)
+    # "not good" = slightly bad, "not bad" = slightly good.
+    return [p * -0.5 if n else p for p, n in zip(polarities, negated)], subjectivities
+
+def _score_chunk(texts):
+    model = _load_model()
+
+    doc_ids, polarities, subjectivities = [], [], []
+    for doc_id, text in enumerate(texts):
+        p, s = _assess(text, *model)
+        doc_ids.extend([doc_id] * len(p))
+        polarities.extend(p)
+        subjectivities.extend(s)
+
+    doc_ids = np.asarray(doc_ids, dtype=np.intp)
+    counts = np.maximum(np.bincount(doc_ids, minlength=len(texts)), 1)
+    polarity = np.bincount(doc_ids, weights=np.asarray(polarities, dtype=np.float64), minlength=len(texts)) / counts
+    subjectivity = np.bincount(doc_ids, weights=np.asarray(subjectivities, dtype=np.float64), minlength=len(texts)) / counts
+    return list(zip(polarity.tolist(), subjectivity.tolist()))
+
+def _get_pool(processes):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=processes)
+    return _pool
+
+@timed("sentiment")
+def score_documents(texts, processes=None):
+    """
+    Score many documents in one call with the same results as TextBlob
+
+    Args:
+        texts (list): Documents; anything that is not a string longer than
+            50 characters scores None
+        processes (int): Worker processes for large batches; defaults to
+            SENTIMENT_PROCESSES (0 = score in-process)
+
+    Returns:
+        list: {'raw_polarity', 'raw_subjectivity'} dicts or None, per text
+    """
+    processes = SENTIMENT_PROCESSES if processes is None else processes
+    indexed = [i for i, text in enumerate(texts) if text and isinstance(text, str) and len(text) > MIN_CONTENT_LENGTH]
+    docs = [texts[i] for i in indexed]
+
+    if processes > 1 and len(docs) >= SENTIMENT_POOL_MIN_BATCH:
+        size = -(-len(docs) // processes)
+        chunks = [docs[start:start + size] for start in range(0, len(docs), size)]
+        scores = [score for chunk in _get_pool(processes).map(_score_chunk, chunks) for score in chunk]
+    else:
+        scores = _score_chunk(docs) if docs else []
+
+    results = [None] * len(texts)
+    for i, (polarity, subjectivity) in zip(indexed, scores):
+        results[i] = {'raw_polarity': polarity, 'raw_subjectivity': subjectivity}
+    return results
+
+def score_sentiment_textblob(content):
+    """Reference per-document path, kept for parity checks and benchmarks."""
+    if content and isinstance(content, str) and len(content) > MIN_CONTENT_LENGTH:
+        try:
+            from textblob import TextBlob
+            sentiment = TextBlob(content).sentiment
+            return {
+                'raw_polarity': sentiment.polarity,
+                'raw_subjectivity': sentiment.subjectivity
+            }
+        except Exception:
+            return None
+    return None
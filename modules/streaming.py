@@ -0,0 +1,75 @@
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from modules.pipeline import stream_articles, iter_sync
+from modules.article_store import present
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+def requested_stream_format(request, data):
+    """'ndjson' or 'sse' if the client opted into streaming, else None."""
+    requested = (data or {}).get('stream')
+    if requested in STREAM_MIMETYPES:
+        return requested
+    accept = request.headers.get('Accept', '')
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return stream_format
+    return None
+
+def _dumps(obj):
+    if orjson is None:
+        return json.dumps(obj).encode('utf-8')
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+def _encode(stream_format, event, payload):
+    """One event as bytes: the payload alone for SSE, wrapped in a {type, data} envelope for NDJSON."""
+    if stream_format == 'sse':
+        return b"event: " + event.encode('ascii') + b"\ndata: " + _dumps(payload) + b"\n\n"
+    return _dumps({'type': event, 'data': payload}) + b"\n"
+
+def _streamed(events, stream_format):
+    return Response(
+        events,
+        mimetype=STREAM_MIMETYPES[stream_format],
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def stream_ready(articles, total_results, page, stream_format, view='list'):
+    """Same events as stream_response for articles that are already processed and stored, e.g. from a materialized feed."""
+    def generate():
+        yield _encode(stream_format, 'meta', {'totalResults': total_results, 'page': page})
+        for article in present(articles, view):
+            yield _encode(stream_format, 'article', article)
+        yield _encode(stream_format, 'end', {'count': len(articles)})
+
+    return _streamed(generate(), stream_format)
+
+def stream_response(api_response, page, stream_format, deadline=None, view='list'):
+    """
+    Stream a fetched NewsAPI page as articles become ready
+
+    Emits a 'meta' event (totalResults, page), one 'article' event per
+    article that passes the endpoint filter, in completion order, and a
+    final 'end' event with the number of articles sent. Articles are
+    sent in the given view (see modules.article_store).
+    """
+    def generate():
+        yield _encode(stream_format, 'meta', {'totalResults': api_response.get('totalResults', 0), 'page': page})
+        count = 0
+        for article in iter_sync(stream_articles(api_response, deadline=deadline)):
+            count += 1
+            [payload] = present([article], view)
+            yield _encode(stream_format, 'article', payload)
+        yield _encode(stream_format, 'end', {'count': count})
+
+    return _streamed(generate(), stream_format)
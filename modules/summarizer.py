@@ -1,76 +1,155 @@
 import os
-import google.generativeai as genai
+import time
+import hashlib
+import threading
 from flask import jsonify
 from datetime import datetime, timedelta
 
-from modules.scrape_article import scrape_article
 from modules.news_api import get_articles
-from modules.content import clean_and_format_content
+from modules.content import clean_and_format_content, scrape_article, scrape_articles
+from modules.result_cache import get_or_fetch
+from modules.prompt import assemble_articles_text
+from modules.related_index import get_index
+from modules.instrumentation import stage
+
+# "gemini" in production; "stub" answers locally for tests and benchmarks.
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "gemini")
+SUMMARIZER_STUB_LATENCY = float(os.getenv("SUMMARIZER_STUB_LATENCY", "0"))
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", "21600"))
+# Model calls take far longer than NewsAPI ones; waiters should outlast the slowest.
+SUMMARY_LOCK_TTL_MS = int(os.getenv("SUMMARY_LOCK_TTL_MS", "120000"))
+SUMMARY_WAIT_SECONDS = float(os.getenv("SUMMARY_WAIT_SECONDS", "90"))
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables!")
+if SUMMARIZER_BACKEND == "gemini":
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not found in environment variables!")
 
-genai.configure(api_key=GEMINI_API_KEY)
+_genai = None
+_genai_lock = threading.Lock()
 
-def related_articles_content(article_url, NEWSAPI_KEY):
-    original_content = scrape_article(article_url)
-    if not original_content:
-        return None, None, None
+def _gemini_client():
+    """Import and configure the Gemini SDK on first use; the import alone takes about half a second."""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+RELATED_ARTICLES = 5
+# Use the local index when it has at least this many matches, else ask NewsAPI.
+RELATED_MIN_LOCAL = int(os.getenv("RELATED_MIN_LOCAL", "3"))
+RELATED_WINDOW_HOURS = float(os.getenv("RELATED_WINDOW_HOURS", "48"))
+
+def _related_from_index(article_url, original_content):
+    matches = get_index().query(original_content, k=RELATED_ARTICLES, window_hours=RELATED_WINDOW_HOURS, exclude_url=article_url)
+    if len(matches) < RELATED_MIN_LOCAL:
+        return None
+    return [{'url': entry['url'], 'title': entry['title']} for _, entry in matches]
 
+def _related_from_newsapi(original_content, NEWSAPI_KEY):
     from_date = (datetime.utcnow() - timedelta(days=2)).strftime('%Y-%m-%d')
     params = {
         'q': ' '.join(original_content.split()[:50]),
         'from': from_date,
         'language': 'en',
         'sortBy': 'relevancy',
-        'pageSize': 5,
+        'pageSize': RELATED_ARTICLES,
         'apiKey': NEWSAPI_KEY
     }
     related_articles_api_response = get_articles(params)
-    related_articles = related_articles_api_response.get('articles', [])
+    return related_articles_api_response.get('articles', [])
+
+def related_articles_content(article_url, NEWSAPI_KEY):
+    original_content = scrape_article(article_url)
+    if not original_content:
+        return None, None, None
+
+    with stage("related"):
+        related_articles = _related_from_index(article_url, original_content)
+        if related_articles is None:
+            related_articles = _related_from_newsapi(original_content, NEWSAPI_KEY)
+
+    contents = scrape_articles([article.get('url') for article in related_articles])
 
     docs = []
     info = []
-    for article in related_articles:
-        url = article.get('url')
-        title = article.get('title')
-        content = scrape_article(url)
+    for article, content in zip(related_articles, contents):
         if content:
             formatted_content = clean_and_format_content(content)
             if formatted_content:
                 docs.append(formatted_content)
-                info.append({'title': title, 'url': url})
+                info.append({'title': article.get('title'), 'url': article.get('url')})
 
     if not docs:
         docs.append(original_content)
 
     return docs, None, info
 
-def gemini_summarizer(docs, info=None):
-    if not docs:
-        return jsonify({"error": "No content available to summarize."})
+def summary_cache_key(docs, info):
+    h = hashlib.sha1()
+    for url in sorted(item.get('url') or '' for item in info or []):
+        h.update(url.encode('utf-8'))
+        h.update(b'\0')
+    h.update(b'\1')
+    for doc in docs:
+        h.update(hashlib.sha1(doc.encode('utf-8')).digest())
+    return f"summary:{h.hexdigest()}"
 
-    all_text = '\n\n'.join(docs)
+def build_prompt(docs):
+    all_text = assemble_articles_text(docs)
     
-    prompt = f"""These are some news articles. Your job is to extract the factual data from these without changing any context; just present facts in a short 4-5 line professional summary.
+    return f"""These are some news articles. Your job is to extract the factual data from these without changing any context; just present facts in a short 4-5 line professional summary.
 
 Articles:
 {all_text}"""
 
+def _generate_gemini(prompt):
+    model = _gemini_client().GenerativeModel('gemini-2.5-flash')
+    response = model.generate_content(prompt)
+    return response.text
+
+def _generate_stub(prompt):
+    time.sleep(SUMMARIZER_STUB_LATENCY)
+    articles = prompt.split("Articles:", 1)[-1].split()
+    return "Summary: " + " ".join(articles[:60])
+
+GENERATORS = {
+    'gemini': _generate_gemini,
+    'stub': _generate_stub,
+}
+
+def _summarize(docs, info):
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        summary = response.text
+        with stage("prompt"):
+            prompt = build_prompt(docs)
+        with stage("llm"):
+            summary = GENERATORS[SUMMARIZER_BACKEND](prompt)
     except Exception as e:
-        return jsonify({"error": f"Summarization failed: {str(e)}"})
+        return {"error": f"Summarization failed: {str(e)}"}
 
-    summary_data = {
+    return {
         'articles': [{
             'title': 'Summary',
             'description': summary,
             'info': info if info else []
         }]
     }
-    
-    return jsonify(summary_data)
\ No newline at end of file
+
+def gemini_summarizer(docs, info=None):
+    if not docs:
+        return jsonify({"error": "No content available to summarize."})
+
+    # Identical requests share one cached summary, and concurrent ones a single model call.
+    summary_data = get_or_fetch(
+        summary_cache_key(docs, info),
+        lambda: _summarize(docs, info),
+        ttl=SUMMARY_CACHE_TTL,
+        cacheable=lambda value: 'error' not in value,
+        lock_ttl_ms=SUMMARY_LOCK_TTL_MS,
+        wait_seconds=SUMMARY_WAIT_SECONDS
+    )
+    return jsonify(summary_data)
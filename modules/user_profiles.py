@@ -0,0 +1,47 @@
+import os
+import json
+import hashlib
+import logging
+
+from cache import get_one, set_one, delete_many
+from models import User
+
+logger = logging.getLogger(__name__)
+
+USER_PROFILE_CACHE_TTL = int(os.getenv("USER_PROFILE_CACHE_TTL", "86400"))
+
+def profile_key(email):
+    # Hashed so addresses never appear in key listings.
+    return f"user_profile:{hashlib.sha1(email.encode('utf-8')).hexdigest()}"
+
+def store_profile(user):
+    """Write a user's public profile (User.as_dict) to the cache; call after every change."""
+    profile = user.as_dict()
+    key = profile_key(user.email)
+    if not set_one(key, json.dumps(profile), USER_PROFILE_CACHE_TTL):
+        # The old profile may still be cached; drop it so reads go to the database.
+        if not delete_many([key]):
+            logger.error(f"Cached profile {key} may be stale: neither refreshed nor dropped")
+    return profile
+
+def get_profile(email):
+    """
+    Fetch a user's profile, from cache when possible
+
+    Args:
+        email (str): User's email
+
+    Returns:
+        dict: name, email and preferred_domains, or None if there is no such user
+    """
+    cached = get_one(profile_key(email))
+    if cached:
+        try:
+            return json.loads(cached)
+        except ValueError as e:
+            logger.error(f"Corrupt user profile entry: {e}")
+
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return None
+    return store_profile(user)
@@ -0,0 +1,154 @@
+"""
+Background prefetch worker.
+
+Keeps the NewsAPI, article and processed-article caches warm for top
+headlines, and materializes a feed for each of the topics users pick most
+often (see modules.feeds), so user requests are served from cache instead
+of scraping on the request path.
+
+    python worker.py          # run forever on the configured schedule
+    python worker.py --once   # run every job once and exit (e.g. from cron)
+    python worker.py --migrate-cache  # rewrite old plain-text article cache entries and exit
+"""
+import os
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from flask import Flask
+
+from models import db, User, engine_options
+from modules.news_api import get_articles, top_headlines
+from modules.article_cache import migrate_legacy_entries
+from modules.pipeline import fetch_page, process_page, run_sync
+from modules.feeds import materialize_topic
+from modules.queries import canonical_topics, everything_params, headline_params
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("worker")
+
+NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+PREFETCH_HEADLINES_INTERVAL = int(os.getenv("PREFETCH_HEADLINES_INTERVAL", "600"))
+PREFETCH_POPULAR_INTERVAL = int(os.getenv("PREFETCH_POPULAR_INTERVAL", "900"))
+# Topics given a materialized feed; PREFETCH_TOP_QUERIES is the old name.
+PREFETCH_TOP_TOPICS = int(os.getenv("PREFETCH_TOP_TOPICS", os.getenv("PREFETCH_TOP_QUERIES", "10")))
+PREFETCH_PAGES = int(os.getenv("PREFETCH_PAGES", "1"))
+# Pages processed at once; each page scrapes on the shared pool in modules.content.
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+# Minimum seconds between two upstream NewsAPI calls from this worker.
+PREFETCH_MIN_REQUEST_INTERVAL = float(os.getenv("PREFETCH_MIN_REQUEST_INTERVAL", "2"))
+PREFETCH_SCRAPE_DEADLINE = float(os.getenv("PREFETCH_SCRAPE_DEADLINE", "60"))
+
+_rate_lock = threading.Lock()
+_last_request_at = 0.0
+
+def _rate_limited(call, params):
+    global _last_request_at
+    with _rate_lock:
+        wait = _last_request_at + PREFETCH_MIN_REQUEST_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request_at = time.monotonic()
+    return call(params, force_refresh=True)
+
+async def _fetch_and_process(call, params):
+    # The same prefiltering, negative cache, dedup and caching as the live endpoints.
+    api_response = await fetch_page(partial(_rate_limited, call), params)
+    if api_response.get('status') != 'ok':
+        return api_response
+    # Only the web processes query the related-article index; don't build one here.
+    return await process_page(api_response, deadline=PREFETCH_SCRAPE_DEADLINE, index_related=False)
+
+def warm_page(call, params):
+    api_response = run_sync(_fetch_and_process(call, params))
+    if api_response.get('status') != 'ok':
+        logger.error(f"Prefetch failed for {params.get('q') or 'headlines'}: {api_response.get('message', 'Unknown')}")
+        return 0
+    return len(api_response.get('articles', []))
+
+def warm_feed_page(topic, params):
+    api_response = run_sync(_fetch_and_process(get_articles, params))
+    if api_response.get('status') != 'ok':
+        logger.error(f"Feed refresh failed for {topic}: {api_response.get('message', 'Unknown')}")
+        return 0
+    return materialize_topic(topic, api_response.get('articles', []))
+
+def popular_topics(limit):
+    counts = Counter()
+    for (topics,) in User.query.with_entities(User.preferred_domains).all():
+        counts.update(canonical_topics(topics))
+    return [topic for topic, _ in counts.most_common(limit)]
+
+def headline_jobs():
+    return [partial(warm_page, top_headlines, headline_params(page, api_key=NEWSAPI_KEY)) for page in range(1, PREFETCH_PAGES + 1)]
+
+def popular_jobs(app):
+    with app.app_context():
+        topics = popular_topics(PREFETCH_TOP_TOPICS)
+    return [
+        partial(warm_feed_page, topic, everything_params(topic, page, days=3, api_key=NEWSAPI_KEY))
+        for topic in topics
+        for page in range(1, PREFETCH_PAGES + 1)
+    ]
+
+def run_jobs(name, jobs):
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY) as executor:
+        warmed = sum(executor.map(lambda job: job(), jobs))
+    logger.info(f"{name}: warmed {warmed} articles across {len(jobs)} pages in {time.monotonic() - start:.1f}s")
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DATABASE_URL)
+    db.init_app(app)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="NewsLens cache prefetch worker")
+    parser.add_argument("--once", action="store_true", help="run every job once and exit")
+    parser.add_argument("--migrate-cache", action="store_true", help="rewrite old-format article cache entries and exit")
+    args = parser.parse_args()
+
+    if args.migrate_cache:
+        logger.info(f"Migrated {migrate_legacy_entries()} article cache entries")
+        return
+
+    if not NEWSAPI_KEY:
+        raise ValueError("NEWSAPI_KEY not found in environment variables!")
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL not found in environment variables!")
+
+    app = create_app()
+    schedule = {
+        'headlines': (PREFETCH_HEADLINES_INTERVAL, headline_jobs),
+        'popular': (PREFETCH_POPULAR_INTERVAL, lambda: popular_jobs(app)),
+    }
+    next_run = {name: 0.0 for name in schedule}
+
+    while True:
+        for name, (interval, jobs) in schedule.items():
+            if time.monotonic() < next_run[name]:
+                continue
+            try:
+                run_jobs(name, jobs())
+            except Exception as e:
+                logger.error(f"{name} prefetch failed: {e}")
+            next_run[name] = time.monotonic() + interval
+
+        if args.once:
+            return
+        time.sleep(max(1.0, min(next_run.values()) - time.monotonic()))
+
+if __name__ == '__main__':
+    main()